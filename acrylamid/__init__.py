@@ -60,6 +60,15 @@ class AcrylFormatter(argparse.HelpFormatter):
         return format
 
 
+def positive(value):
+    """Argument type for a number of parallel jobs."""
+
+    rv = int(value)
+    if rv < 1:
+        raise argparse.ArgumentTypeError('%r is not a positive number' % value)
+    return rv
+
+
 def acryl():
     """The main function that dispatches the CLI.  We use :class:`AcrylFormatter`
     as custom help formatter that ommits the useless list of available subcommands
@@ -103,6 +112,11 @@ def acryl():
         help="ignore critical errors", default=False)
     generate.add_argument("--search", dest="search", action="store_true",
         help="build search index", default=False)
+    generate.add_argument("-j", "--jobs", dest="jobs", type=positive, default=1,
+        help="N parallel processes", metavar="N")
+    generate.add_argument("--profile", dest="profile", nargs="?", const=True,
+        default=False, help="print timings and optionally dump them as JSON",
+        metavar="FILE")
 
     # --- webserver params --- #
     view = subparsers.add_parser('view', help="fire up built-in webserver", parents=[default])
@@ -120,6 +134,8 @@ def acryl():
         help="ignore critical errors", default=False)
     autocompile.add_argument("--search", dest="search", action="store_true",
         help="build search index", default=False)
+    autocompile.add_argument("-j", "--jobs", dest="jobs", type=positive, default=1,
+        help="N parallel processes", metavar="N")
     autocompile.add_argument("-p", "--port", dest="port", type=int, default=8000,
         help="webserver port")
 
@@ -9,21 +9,23 @@ import sys
 import os
 import time
 import locale
+import multiprocessing
 
 from datetime import datetime
-from itertools import chain
+from itertools import chain, groupby
 from collections import defaultdict
 from os.path import getmtime
 
 from distutils.version import LooseVersion
 
 from acrylamid import log, compat
-from acrylamid.compat import iteritems, iterkeys, string_types, text_type as str
+from acrylamid.compat import iteritems, iterkeys, text_type as str
 from acrylamid.errors import AcrylamidException
 
-from acrylamid import readers, filters, views, assets, refs, hooks, helpers, dist
-from acrylamid.lib import lazy, history
-from acrylamid.core import cache, load, Environment
+from acrylamid import readers, filters, views, assets, refs, hooks, helpers, dist, profiler
+from acrylamid.lib import lazy, history, watch
+from acrylamid.lib._async import Threadpool
+from acrylamid.core import cache, load, tracker, Environment
 from acrylamid.utils import hash, HashableList, import_object, OrderedDict as dict
 from acrylamid.utils import total_seconds
 from acrylamid.helpers import event
@@ -40,7 +42,8 @@ def initialize(conf, env):
     a data dict is returned.
     """
     # initialize cache, optional to cache_dir
-    cache.init(conf.get('cache_dir'))
+    cache.init(conf.get('cache_dir'), conf.get('cache_backend'), conf.get('cache_max_size'),
+               conf.get('cache_memory'))
 
     env['version'] = type('Version', (str, ), dict(zip(
         ['major', 'minor'], LooseVersion(dist.version).version[:2])))(dist.version)
@@ -120,8 +123,138 @@ def initialize(conf, env):
     return {'conf': conf, 'env': env}
 
 
-def compile(conf, env):
-    """The compilation process."""
+#: entries to pre-render, inherited by the forked worker processes
+_queue = []
+
+
+def _prerender(i):
+    """Worker: evaluate the content of an entry for each view it is used in."""
+
+    entry = _queue[i]
+    try:
+        for view in entry.filters.views:
+            if view is not None:
+                entry.context = view
+                entry.content
+    except Exception:
+        log.exception('unable to pre-render %s', entry.filename)
+
+    # pass recorded timings and configuration reads to the main process
+    return profiler.collect() if profiler.enabled else None, tracker.collect()
+
+
+def prerender(entries, jobs):
+    """Compile the content of `entries` for every view context using `jobs`
+    worker processes.  The workers save the results into the cache, so the
+    actual views do not have to run the filter chain again.
+
+    The workers inherit entries and filters from the main process, therefore
+    this only works on platforms that are able to fork."""
+
+    global _queue
+
+    if not entries or not hasattr(os, 'fork'):
+        return
+
+    # workers must not see stale intermediates nor remove fresh ones
+    for entry in entries:
+        entry.purge()
+
+    _queue = entries
+    sys.stdout.flush()
+
+    ctx = multiprocessing.get_context('fork') if hasattr(
+        multiprocessing, 'get_context') else multiprocessing
+    pool = ctx.Pool(min(jobs, len(entries)), profiler.reset)
+
+    try:
+        for stats, reads in pool.imap_unordered(_prerender, range(len(entries)),
+                                                max(1, len(entries) // (jobs * 4))):
+            if stats:
+                profiler.merge(stats)
+            tracker.merge(reads)
+    except KeyboardInterrupt:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+        _queue = []
+
+
+def generate(views, data, render, write, jobs):
+    """Render `views` in `jobs` parallel threads.  Views with equal priority
+    run concurrently, thus a view with a lower priority (e.g. the sitemap)
+    still starts after all views with a higher priority have finished.
+
+    The output goes into a bounded queue that is drained by a few writer
+    threads, hence fast views do not pile up rendered pages in memory.
+
+    :param views: views sorted by priority
+    :param data: request dictionary, each view receives its own copy
+    :param render: function that renders a single view, receives the view,
+                   the request dictionary and a write function
+    :param write: function that writes a single output file"""
+
+    failed = []
+
+    def guard(func, *args):
+        try:
+            func(*args)
+        except BaseException:
+            failed.append(sys.exc_info()[1])
+
+    writers = Threadpool(2)
+    deferred = lambda *args: writers.add_task(guard, write, *args)
+
+    pool = Threadpool(jobs)
+    for priority, group in groupby(views, key=lambda v: v.priority):
+        for v in group:
+            pool.add_task(guard, render, v, data.copy(), deferred)
+        pool.wait_completion()
+        writers.wait_completion()
+
+        if failed:
+            raise failed[0]
+
+
+def rewarm(conf, env, changed):
+    """Prepare `conf` and `env` of a previous compilation for the next one in
+    the same process: forget the modification state, reload changed templates
+    and re-initialize the views.  Entries and filters are re-used by
+    :func:`compile`, a data dict is returned.  Falls back to
+    :func:`initialize` if the template engine can not be re-used."""
+
+    if not env.engine.warm:
+        return initialize(conf, env)
+
+    for obj in conf, env:
+        obj.__dict__.pop('modified', None)
+
+    env.engine.invalidate(changed)
+
+    views.initialize(conf["views_dir"][:], conf, env)
+    env.views = views.Views(view for view in views.get_views())
+
+    return {'conf': conf, 'env': env}
+
+
+def compile(conf, env, changed=None, warm=None):
+    """The compilation process.
+
+    :param changed: set of paths changed since the last compilation or
+                    ``None`` if unknown, see :func:`autocompile`
+    :param warm: a dictionary that keeps entries and filters for the next
+                 compilation of `conf` and `env`, see :func:`rewarm`"""
+
+    # incremental compilation, re-use the previous state
+    warmed = bool(warm) and changed is not None and not env.options.force \
+        and env.engine.warm
+
+    if getattr(env.options, 'profile', False):
+        profiler.enable()
+        profiler.reset()
 
     hooks.initialize(conf, env)
     hooks.run(conf, env, 'pre')
@@ -132,12 +265,20 @@ def compile(conf, env):
     # time measurement
     ctime = time.time()
 
+    # processed content is valid for this compilation only
+    cache.memory.clear()
+
+    # record which keys of conf and env the views actually use
+    tracker.init(conf, env)
+
     # populate env and corrects some conf things
-    data = initialize(conf, env)
+    data = rewarm(conf, env, changed) if warmed else initialize(conf, env)
 
     # load pages/entries and store them in env
-    rv = dict(zip(['entrylist', 'pages', 'translations', 'drafts'],
-        map(HashableList, readers.load(conf))))
+    with profiler.timed('readers.load'), tracker.record('readers'):
+        rv = dict(zip(['entrylist', 'pages', 'translations', 'drafts'],
+            map(HashableList, readers.load(conf, env.options.jobs, changed,
+                                           warm['entries'] if warmed else None))))
 
     entrylist, pages = rv['entrylist'], rv['pages']
     translations, drafts = rv['translations'], rv['drafts']
@@ -149,7 +290,7 @@ def compile(conf, env):
     env.globals.update(rv)
 
     # here we store all found filter and their aliases
-    ns = defaultdict(set)
+    ns = warm['filters'] if warmed else defaultdict(set)
 
     # [<class head_offset.Headoffset at 0x1014882c0>, <class html.HTML at 0x101488328>,...]
     aflist = filters.get_filters()
@@ -160,7 +301,18 @@ def compile(conf, env):
     # filters found in all entries, views and conf.py (skip translations, has no items)
     found = sum((x.filters for x in chain(entrylist, pages, drafts, _views, [conf])), [])
 
+    # forget filters no longer in use and skip already initialized ones
+    for fx in list(ns):
+        ns[fx] &= set(found)
+        if not ns[fx]:
+            del ns[fx]
+
+    known = set(chain(*ns.values()))
+
     for val in found:
+        if val in known:
+            continue
+
         # first we for `no` and get the function name and arguments
         f = val[2:] if val.startswith('no') else val
         fname, fargs = f.split('+')[:1][0], f.split('+')[1:]
@@ -177,6 +329,7 @@ def compile(conf, env):
                 raise AcrylamidException('no such filter: %s' % val)
 
         ns[fx].add(val)
+        known.add(val)
 
     # include actual used filters to trigger modified state
     env.filters = HashableList(iterkeys(ns))
@@ -201,31 +354,55 @@ def compile(conf, env):
 
     # lets offer a last break to populate tags and such
     for v in _views:
-        env = v.context(conf, env, data)
+        with tracker.record(v):
+            env = v.context(conf, env, data)
 
-    # now teh real thing!
-    for v in _views:
+    outdated = [entry for entry in chain(entrylist, pages, drafts)
+                if entry.modified or not cache.getmtime(entry.cachefilename)
+                or conf.modified or env.modified]
+
+    # let filters convert outdated entries in bulk
+    for fx in ns:
+        fx.prefetch(outdated)
+
+    # compile outdated entries in parallel, views will only read from cache
+    if env.options.jobs > 1:
+        prerender(outdated, env.options.jobs)
+
+    def write(buf, path, ctime, ns):
+        try:
+            helpers.mkfile(buf, path, ctime, ns=ns,
+                force=env.options.force, dryrun=env.options.dryrun)
+        except UnicodeError:
+            log.exception(path)
+        finally:
+            buf.close()
+
+    def render(v, data, write=write):
 
         for entry in chain(entrylist, pages, translations, drafts):
             entry.context = v
 
         for var in 'entrylist', 'pages', 'translations', 'drafts':
-            data[var] = HashableList(filter(v.condition, locals()[var])) \
-                if v.condition else locals()[var]
+            data[var] = HashableList(filter(v.condition, rv[var])) \
+                if v.condition else rv[var]
 
         tt = time.time()
-        for buf, path in v.generate(conf, env, data):
-            try:
-                helpers.mkfile(buf, path, time.time()-tt, ns=v.name,
-                    force=env.options.force, dryrun=env.options.dryrun)
-            except UnicodeError:
-                log.exception(path)
-            finally:
-                buf.close()
-            tt = time.time()
+        with tracker.record(v):
+            for buf, path in profiler.iterate('view:' + v.name, v.generate(conf, env, data)):
+                write(buf, path, time.time()-tt, v.name)
+                tt = time.time()
+
+    # now teh real thing!
+    if env.options.jobs > 1:
+        generate(_views, data, render, write, env.options.jobs)
+    else:
+        for v in _views:
+            render(v, data)
 
     # copy modified/missing assets to output
-    assets.compile(conf, env)
+    with profiler.timed('assets.compile'):
+        assets.compile(conf, env)
 
     # wait for unfinished hooks
     hooks.shutdown()
@@ -236,63 +413,83 @@ def compile(conf, env):
     # save conf/environment hash and new/changed/unchanged references
     helpers.memoize('Configuration', hash(conf))
     helpers.memoize('Environment', hash(env))
+    tracker.save()
     refs.save()
 
     # remove abandoned cache files
     cache.shutdown()
 
+    if warm is not None and env.engine.warm:
+        warm['entries'] = dict((entry.filename, entry)
+            for entry in chain(entrylist, pages, translations, drafts))
+        warm['filters'] = ns
+
     # print a short summary
     log.info('%i new, %i updated, %i skipped [%.2fs]', event.count('create'),
              event.count('update'), event.count('identical') + event.count('skip'),
              time.time() - ctime)
 
+    # re-used content saved a cache lookup (and decompression) per filter chain
+    log.debug('content memory: %i hits, %i misses', cache.memory.hits, cache.memory.misses)
+
+    if profiler.enabled:
+        profiler.record('content.memory.hit', 0.0, cache.memory.hits)
+        profiler.record('content.memory.miss', 0.0, cache.memory.misses)
+        profiler.report()
+        if getattr(env.options, 'profile', None) not in (None, True, False):
+            profiler.dump(env.options.profile)
+
+    cache.memory.clear()
+
 
 def autocompile(ws, conf, env):
     """Subcommand: autocompile -- automatically re-compiles when something in
-    content-dir has changed and parallel serving files."""
+    content-dir has changed and parallel serving files.  Changes are reported
+    by :mod:`acrylamid.lib.watch` (inotify on Linux, polling otherwise)."""
 
-    mtime = -1
     cmtime = getmtime('conf.py')
 
-    # config content_extension originally defined as string, not a list
-    exts = conf.get('content_extension',['.txt', '.rst', '.md'])
-    if isinstance(exts, string_types):
-        whitelist = (exts,)
-    else:
-        whitelist = tuple(exts)
+    watcher = watch.watch(
+        [(conf['content_dir'], conf['content_ignore'])] +
+        [(theme, conf['theme_ignore']) for theme in conf['theme']] +
+        [(conf['static'], conf['static_ignore'])])
 
-    while True:
+    # compile everything on startup, keep entries, filters and templates
+    changed, warm = None, {}
 
-        ws.wait = True
-        ntime = max(
-            max(getmtime(e) for e in readers.filelist(
-                conf['content_dir'], conf['content_ignore']) if e.endswith(whitelist)),
-            max(getmtime(p) for p in chain(
-                [f for theme in conf['theme'] for f in readers.filelist(theme, conf['theme_ignore'])],
-                readers.filelist(conf['static'], conf['static_ignore']))))
+    while True:
 
-        if mtime != ntime:
+        if changed is None or changed:
+            ws.wait = True
             try:
-                compile(conf, env)
+                compile(conf, env, changed, warm)
             except (SystemExit, KeyboardInterrupt):
+                watcher.close()
                 raise
             except Exception:
                 log.exception("uncaught exception during auto-compilation")
-            else:
+                warm.clear()
+
+            if not warm:
                 conf = load(env.options.conf)
                 env = Environment.new(env)
             event.reset()
-            mtime = ntime
-        ws.wait = False
+            event.clear()
+            ws.wait = False
 
         if cmtime != getmtime('conf.py'):
             log.info(' * Restarting due to change in conf.py')
+            watcher.close()
             # Kill the webserver
             ws.shutdown()
             # Restart acrylamid
             os.execvp(sys.argv[0], sys.argv)
 
-        time.sleep(1)
+        try:
+            changed = watcher.wait(timeout=1.0)
+        except KeyboardInterrupt:
+            watcher.close()
+            raise
 
 
-__all__ = ["compile", "autocompile"]
+__all__ = ["compile", "autocompile", "rewarm", "prerender", "generate"]
@@ -7,27 +7,36 @@
 
 import os
 import io
+import re
+import time
 import zlib
 import types
 import pickle
 import shutil
 import tempfile
+import threading
 
 from os.path import join, exists, getmtime, getsize, dirname, basename
 
-from acrylamid import log, defaults
+from acrylamid import log, defaults, profiler
 from acrylamid.errors import AcrylamidException
-from acrylamid.compat import PY2K, iteritems, iterkeys
+from acrylamid.compat import PY2K, iteritems, iterkeys, string_types
 
 from acrylamid.utils import (
     classproperty, cached_property, Struct, hash, HashableList, find, execfile,
-    lchop, force_unicode as u
+    lchop, force_unicode as u, LRU
 )
 
 if PY2K:
     import cPickle as pickle
 
-__all__ = ['Memory', 'cache', 'Environment', 'Configuration']
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None  # NOQA
+
+__all__ = ['Memory', 'cache', 'Directory', 'SQLite', 'Environment', 'Configuration',
+           'tracker']
 
 
 class Memory(dict):
@@ -43,15 +52,207 @@ class Memory(dict):
         return rv != value
 
 
+class Directory(object):
+    """The legacy cache backend: a cache object is a pickled dictionary in a
+    single file, thus adding a single intermediate rewrites the whole file.
+
+    :param cache_dir: directory of the cache objects
+    :param mode: file mode of new cache objects"""
+
+    _fs_transaction_suffix = '.__ac_cache'
+
+    # cache objects are named after the (hex) hash of an entry
+    pattern = re.compile(r'^[0-9a-f]+L?$')
+
+    # ... or hold data shared by all entries, e.g. highlighted code
+    prefixes = ('highlight-', 'hyphenation-', 'acronyms-')
+
+    def __init__(self, cache_dir, mode):
+        self.cache_dir = cache_dir
+        self.mode = mode
+
+    def get(self, path, key):
+        try:
+            with io.open(join(self.cache_dir, path), 'rb') as fp:
+                return pickle.load(fp)[key]
+        except KeyError:
+            pass
+        except (IOError, pickle.PickleError, EOFError):
+            self.remove(path)
+
+    def set(self, path, key, value):
+
+        path = join(self.cache_dir, path)
+
+        if exists(path):
+            try:
+                with io.open(path, 'rb') as fp:
+                    rv = pickle.load(fp)
+            except (pickle.PickleError, IOError, EOFError):
+                self.remove(path)
+                rv = {}
+            try:
+                with io.open(path, 'wb') as fp:
+                    rv[key] = value
+                    pickle.dump(rv, fp, pickle.HIGHEST_PROTOCOL)
+            except (IOError, pickle.PickleError) as e:
+                log.warn('%s: %s' % (e.__class__.__name__, e))
+        else:
+            try:
+                fd, tmp = tempfile.mkstemp(suffix=self._fs_transaction_suffix,
+                                           dir=self.cache_dir)
+                with io.open(fd, 'wb') as fp:
+                    pickle.dump({key: value}, fp, pickle.HIGHEST_PROTOCOL)
+                os.rename(tmp, path)
+                os.chmod(path, self.mode)
+            except (IOError, OSError, pickle.PickleError) as e:
+                log.warn('%s: %s' % (e.__class__.__name__, e))
+
+    def remove(self, path):
+        try:
+            os.remove(join(self.cache_dir, path))
+        except OSError as e:
+            log.debug('OSError: %s' % e)
+
+    def getmtime(self, path):
+        try:
+            return getmtime(join(self.cache_dir, path))
+        except OSError:
+            return None
+
+    def objects(self):
+        for path in os.listdir(self.cache_dir):
+            if not (self.pattern.match(path) or path.startswith(self.prefixes)):
+                continue
+            try:
+                st = os.stat(join(self.cache_dir, path))
+            except OSError:
+                continue
+            yield path, st.st_size, max(st.st_atime, st.st_mtime)
+
+    def touch(self, paths, timestamp):
+        for path in paths:
+            try:
+                os.utime(join(self.cache_dir, path),
+                         (timestamp, getmtime(join(self.cache_dir, path))))
+            except OSError:
+                pass
+
+    def close(self):
+        pass
+
+
+class SQLite(object):
+    """Store all intermediates as separate rows in a single SQLite database,
+    hence :meth:`get` and :meth:`set` only touch the requested intermediate.
+    The modification time of a cache object is the time of its latest write.
+
+    Forked processes (see :func:`acrylamid.commands.prerender`) re-connect to
+    the database and write-ahead logging allows concurrent readers."""
+
+    filename = 'cache.db'
+
+    def __init__(self, cache_dir, mode):
+        self.path = join(cache_dir, self.filename)
+        self.mode = mode
+        self.pid, self.conn, self.inherited = None, None, None
+
+    @property
+    def db(self):
+
+        if self.conn is not None and self.pid == os.getpid():
+            return self.conn
+
+        # never close a connection inherited from the parent process
+        self.inherited, self.pid = self.conn, os.getpid()
+        self.conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+
+        with self.conn:
+            self.conn.execute('PRAGMA journal_mode = WAL')
+            self.conn.execute('PRAGMA synchronous = NORMAL')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS objects ('
+                              '  path TEXT PRIMARY KEY, mtime REAL, atime REAL)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS intermediates ('
+                              '  path TEXT, key TEXT, value BLOB,'
+                              '  PRIMARY KEY (path, key))')
+        try:
+            os.chmod(self.path, self.mode)
+        except OSError:
+            pass
+
+        return self.conn
+
+    def get(self, path, key):
+        try:
+            rv = self.db.execute('SELECT value FROM intermediates WHERE path = ? AND key = ?',
+                                 (path, str(key))).fetchone()
+        except sqlite3.Error as e:
+            log.debug('%s: %s' % (e.__class__.__name__, e))
+        else:
+            return bytes(rv[0]) if rv else None
+
+    def set(self, path, key, value):
+        try:
+            with self.db as db:
+                db.execute('INSERT OR REPLACE INTO intermediates VALUES (?, ?, ?)',
+                           (path, str(key), sqlite3.Binary(value)))
+                db.execute('INSERT OR REPLACE INTO objects VALUES (?, ?, ?)',
+                           (path, time.time(), time.time()))
+        except sqlite3.Error as e:
+            log.warn('%s: %s' % (e.__class__.__name__, e))
+
+    def remove(self, path):
+        try:
+            with self.db as db:
+                db.execute('DELETE FROM intermediates WHERE path = ?', (path, ))
+                db.execute('DELETE FROM objects WHERE path = ?', (path, ))
+        except sqlite3.Error as e:
+            log.debug('%s: %s' % (e.__class__.__name__, e))
+
+    def getmtime(self, path):
+        try:
+            rv = self.db.execute('SELECT mtime FROM objects WHERE path = ?',
+                                 (path, )).fetchone()
+        except sqlite3.Error as e:
+            log.debug('%s: %s' % (e.__class__.__name__, e))
+        else:
+            return rv[0] if rv else None
+
+    def objects(self):
+        try:
+            return self.db.execute(
+                'SELECT path, SUM(LENGTH(value)), MAX(mtime, atime) FROM objects'
+                '  JOIN intermediates USING (path) GROUP BY path').fetchall()
+        except sqlite3.Error as e:
+            log.debug('%s: %s' % (e.__class__.__name__, e))
+            return []
+
+    def touch(self, paths, timestamp):
+        try:
+            with self.db as db:
+                db.executemany('UPDATE objects SET atime = ? WHERE path = ?',
+                               ((timestamp, path) for path in paths))
+        except sqlite3.Error as e:
+            log.debug('%s: %s' % (e.__class__.__name__, e))
+
+    def close(self):
+        if self.conn is not None and self.pid == os.getpid():
+            self.conn.close()
+        self.conn = None
+
+
 class cache(object):
     """A cache that stores all intermediates of an entry zlib-compressed on
     file system. Inspired from ``werkzeug.contrib.cache``, but heavily modified
     to fit our needs.
 
-    Terminology: A cache object is a pickled dictionary into a single file. An
-    intermediate (object) is a key/value pair that we store into a cache object.
-    An intermediate is the content of an entry that is the same for a chain of
-    filters used in different views.
+    Terminology: A cache object is the collection of all intermediates of an
+    entry. An intermediate (object) is a key/value pair that we store into a
+    cache object. An intermediate is the content of an entry that is the same
+    for a chain of filters used in different views.
+
+    Cache objects are persisted by a backend, either :class:`SQLite` (the
+    default) or :class:`Directory`, a pickled dictionary per cache object.
 
     :class:`cache` is designed as global singleton and should not be constructed.
 
@@ -59,32 +260,76 @@ class cache(object):
 
        Location where all cache objects are being stored, defaults to `.cache/`.
 
-    The :class:`cache` does no longer maintain used/unused intermediates and cache
-    objects due performance reasons (and an edge case described in #67)."""
+    .. attribute:: max_size
+
+       Maximum size of all cache objects in bytes. On :meth:`shutdown` the least
+       recently used cache objects are evicted until the cache fits into this
+       limit, defaults to no limit.
+
+    .. attribute:: memory
+
+       The processed content of the most recently used entries (per view),
+       valid for a single compilation, see :attr:`ContentMixin.content`.
+
+    The :class:`cache` records which cache objects have been accessed during a
+    compilation, but it does not track single intermediates due performance
+    reasons (and an edge case described in #67)."""
 
-    _fs_transaction_suffix = '.__ac_cache'
     cache_dir = '.cache/'
     mode = 0o600
+    max_size = None
+
+    # cache objects accessed during this run
+    used = set()
+
+    backends = {'directory': Directory, 'sqlite': SQLite}
+    backend = None
+
+    # views may run concurrently (see ``--jobs``)
+    lock = threading.RLock()
 
     memoize = Memory()
+    memory = LRU(1024)
 
     @classmethod
-    def init(self, cache_dir=None):
+    def init(self, cache_dir=None, backend=None, max_size=None, memory_size=None):
         """Initialize cache object by creating the cache_dir if non-existent,
         read all available cache objects and restore memoized key/values.
 
         :param cache_dir: the directory where cache files are stored.
-        :param mode: the file mode wanted for the cache files, default 0600
+        :param backend: name of the cache backend, defaults to ``'sqlite'``
+        :param max_size: maximum size in bytes, see :attr:`max_size`
+        :param memory_size: number of contents kept in :attr:`memory`
         """
         if cache_dir:
             self.cache_dir = cache_dir
 
+        if memory_size is not None:
+            self.memory = LRU(memory_size)
+
+        self.max_size = max_size
+        self.used = set()
+
         if not exists(self.cache_dir):
             try:
                 os.mkdir(self.cache_dir, 0o700)
             except OSError:
                 raise AcrylamidException("could not create directory '%s'" % self.cache_dir)
 
+        if backend is None:
+            backend = 'sqlite' if sqlite3 is not None else 'directory'
+
+        if backend not in self.backends:
+            raise AcrylamidException("no such cache backend '%s'" % backend)
+
+        if backend == 'sqlite' and sqlite3 is None:
+            log.warn('sqlite3 is not available, using the directory backend instead')
+            backend = 'directory'
+
+        if self.backend is not None:
+            self.backend.close()
+        self.backend = self.backends[backend](self.cache_dir, self.mode)
+
         # load memorized items
         try:
             with io.open(join(self.cache_dir, 'info'), 'rb') as fp:
@@ -96,20 +341,54 @@ class cache(object):
 
     @classmethod
     def shutdown(self):
-        """Write memoized key-value pairs to disk."""
+        """Write memoized key-value pairs to disk, record the access time of
+        all used cache objects and evict the least recently used cache objects
+        if the cache exceeds :attr:`max_size`."""
+
+        with self.lock:
+            self.backend.touch(self.used, time.time())
+            self.used = set()
+
+        if self.max_size is not None:
+            self.evict(self.max_size)
+
         try:
             with io.open(join(self.cache_dir, 'info'), 'wb') as fp:
                 pickle.dump(self.memoize, fp, pickle.HIGHEST_PROTOCOL)
         except (IOError, pickle.PickleError) as e:
             log.warn('%s: %s' % (e.__class__.__name__, e))
 
+    @classmethod
+    def evict(self, max_size):
+        """Remove least recently used cache objects until the size of all
+        cache objects is below `max_size` bytes."""
+
+        objects = sorted(self.objects(), key=lambda obj: obj[2])
+        size, count = sum(obj[1] for obj in objects), 0
+
+        for path, objsize, atime in objects:
+            if size <= max_size:
+                break
+            self.remove(path)
+            size, count = size - objsize, count + 1
+
+        if count:
+            log.info('notice  evicted %i cache objects, cache size is now %.2f mb',
+                     count, size / 1024.0**2)
+
+    @classmethod
+    def objects(self):
+        """Return a list of all cache objects as (path, size, last access)
+        tuples."""
+        with self.lock:
+            return list(self.backend.objects())
+
     @classmethod
     def remove(self, path):
         """Remove a cache object completely from disk and `objects`."""
-        try:
-            os.remove(join(self.cache_dir, path))
-        except OSError as e:
-            log.debug('OSError: %s' % e)
+        with self.lock:
+            self.backend.remove(path)
+            self.used.discard(path)
 
     @classmethod
     def clear(self, directory=None):
@@ -120,7 +399,11 @@ class cache(object):
         if directory is not None:
             self.cache_dir = directory
 
+        if self.backend is not None:
+            self.backend.close()
+
         self.memoize = Memory()
+        self.memory.clear()
         shutil.rmtree(self.cache_dir, ignore_errors=True)
 
     @classmethod
@@ -132,68 +415,55 @@ class cache(object):
         :param key: key of this value
         :param default: default return value
         """
-        try:
-            with io.open(join(self.cache_dir, path), 'rb') as fp:
-                return zlib.decompress(pickle.load(fp)[key]).decode('utf-8')
-        except KeyError:
-            pass
-        except (IOError, pickle.PickleError, zlib.error):
-            self.remove(join(self.cache_dir, path))
+        with profiler.timed('cache.get'):
+            with self.lock:
+                rv = self.backend.get(path, key)
+                self.used.add(path)
+
+            if rv is None:
+                return default
+
+            try:
+                return zlib.decompress(rv).decode('utf-8')
+            except zlib.error:
+                self.remove(path)
 
         return default
 
     @classmethod
     def set(self, path, key, value):
-        """Save a key, value pair into a blob using pickle and moderate zlib
-        compression (level 6). We simply save a dictionary containing all
-        different intermediates (from every view) of an entry.
+        """Save a key, value pair using moderate zlib compression (level 6).
+        A cache object contains all different intermediates (from every view)
+        of an entry.
 
         :param path: path of this cache object
-        :param key: dictionary key where we store the value
+        :param key: key where we store the value
         :param value: a string we compress with zlib and afterwards save
         """
-        path = join(self.cache_dir, path)
-
-        if exists(path):
-            try:
-                with io.open(path, 'rb') as fp:
-                    rv = pickle.load(fp)
-            except (pickle.PickleError, IOError):
-                self.remove(path)
-                rv = {}
+        with profiler.timed('cache.set'):
             try:
-                with io.open(path, 'wb') as fp:
-                    rv[key] = zlib.compress(value.encode('utf-8'), 6)
-                    pickle.dump(rv, fp, pickle.HIGHEST_PROTOCOL)
-            except (IOError, pickle.PickleError) as e:
-                log.warn('%s: %s' % (e.__class__.__name__, e))
-        else:
-            try:
-                fd, tmp = tempfile.mkstemp(suffix=self._fs_transaction_suffix,
-                                           dir=self.cache_dir)
-                with io.open(fd, 'wb') as fp:
-                    pickle.dump({key: zlib.compress(value.encode('utf-8'), 6)}, fp,
-                                pickle.HIGHEST_PROTOCOL)
-                os.rename(tmp, path)
-                os.chmod(path, self.mode)
-            except (IOError, OSError, pickle.PickleError, zlib.error) as e:
+                blob = zlib.compress(value.encode('utf-8'), 6)
+            except zlib.error as e:
                 log.warn('%s: %s' % (e.__class__.__name__, e))
+            else:
+                with self.lock:
+                    self.backend.set(path, key, blob)
+                    self.used.add(path)
 
         return value
 
     @classmethod
     def getmtime(self, path, default=0.0):
-        """Get last modification timestamp from cache object but store it over
-        the whole compilation process so we have the same value for different
-        views.
+        """Get last modification timestamp from cache object.
 
         :param path: valid cache object
-        :param default: default value if an :class:`OSError` occurs
+        :param default: default value if the cache object does not exist
         """
-        try:
-            return getmtime(join(self.cache_dir, path))
-        except OSError:
-            return default
+        with self.lock:
+            rv = self.backend.getmtime(path)
+            if rv is not None:
+                self.used.add(path)
+        return default if rv is None else rv
 
     @classproperty
     @classmethod
@@ -241,17 +511,53 @@ class Environment(Struct):
     """
     blacklist = set(['engine', 'translationsfor', 'options', 'archives', 'webassets'])
 
+    # namespace of recorded reads, see :class:`tracker`
+    _tracked = None
+
     @classmethod
     def new(self, env):
         return Environment({'author': env.author, 'url': env.url,
             'options': env.options, 'globals': Struct()})
 
+    def __getitem__(self, key):
+        if self._tracked is not None and key not in self.blacklist:
+            tracker.read(self._tracked, key)
+        return super(Environment, self).__getitem__(key)
+
+    def __contains__(self, key):
+        if self._tracked is not None and key not in self.blacklist:
+            tracker.read(self._tracked, key)
+        return super(Environment, self).__contains__(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def update(self, *args, **kwargs):
+        # copies of a tracked object (e.g. via helpers.union) are tracked too
+        with tracker.record(None):
+            super(Environment, self).update(*args, **kwargs)
+        for other in args:
+            if isinstance(other, Environment) and other._tracked is not None:
+                self._tracked = other._tracked
+
     def keys(self):
         return sorted(list(set(super(Environment, self).keys()) - self.blacklist))
 
     def values(self):
         for key in self.keys():
-            yield self[key]
+            yield super(Environment, self).__getitem__(key)
+
+    def digest(self, key):
+        """Hash of the current value of `key`, see :class:`tracker`."""
+        if not super(Environment, self).__contains__(key):
+            return -2
+        return hash(self.hashable(super(Environment, self).__getitem__(key)))
+
+    def hashable(self, value):
+        return value
 
     @cached_property
     def modified(self):
@@ -265,19 +571,180 @@ class Configuration(Environment):
     blacklist = set(['if', 'hooks'])
 
     def fetch(self, ns):
-        return Configuration((lchop(k, ns), v)
-            for k, v in iteritems(self) if k.startswith(ns))
+        with tracker.record(None):
+            return Configuration((lchop(k, ns), v)
+                for k, v in iteritems(self) if k.startswith(ns))
 
     def values(self):
-        for key in self.keys():
-            if isinstance(self[key], types.FunctionType):
-                continue
+        for value in super(Configuration, self).values():
+            if not isinstance(value, types.FunctionType):
+                yield self.hashable(value)
+
+    def hashable(self, value):
+        if isinstance(value, types.FunctionType):
+            return -3
+        if isinstance(value, list):
+            return HashableList(value)
+        elif isinstance(value, dict):
+            return Configuration(value)
+        elif isinstance(value, type(None)):
+            return -1
+        return value
 
-            if isinstance(self[key], list):
-                yield HashableList(self[key])
-            elif isinstance(self[key], dict):
-                yield Configuration(self[key])
-            elif isinstance(self[key], type(None)):
-                yield -1
-            else:
-                yield self[key]
+
+class Recorder(object):
+
+    __slots__ = ('keys', 'prev')
+
+    def __init__(self, keys):
+        self.keys = keys
+
+    def __enter__(self):
+        self.prev = getattr(tracker.local, 'keys', None)
+        tracker.local.keys = self.keys
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        tracker.local.keys = self.prev
+
+
+class tracker(object):
+    """Records which keys of :class:`Configuration` and :class:`Environment`
+    each view (and the templates it renders) reads during a compilation, so
+    that a view only re-renders its output if one of *these* keys changed
+    and not on any change of `conf.py` or the environment.
+
+    Keys read by filters are recorded on behalf of all views, because the
+    content of an entry ends up in (almost) every view.  The same applies to
+    keys read while loading the entries (e.g. ``entry_permalink``), recorded
+    for ``'readers'``.  Likewise, all views depend on ``env.globals`` which
+    contains all entries.  Missing keys are recorded as well, a view does
+    not notice a new key otherwise.
+
+    .. code-block:: python
+
+        with tracker.record(view):
+            for html, path in view.generate(conf, env, data):
+                ...
+
+        tracker.modified(view)  # in the next compilation
+
+    :class:`tracker` is designed as global singleton and should not be constructed."""
+
+    local = threading.local()
+
+    conf = env = None
+
+    # consumer -> set of (namespace, key)
+    reads = {}
+
+    # consumer -> view
+    views = {}
+
+    # consumer -> modified
+    results = {}
+
+    # consumers recorded on behalf of all views
+    shared = ('filters', 'readers')
+
+    @classmethod
+    def init(self, conf, env):
+        """Track reads of `conf` and `env` (and their copies)."""
+
+        conf._tracked, env._tracked = 'conf', 'env'
+        self.conf, self.env = conf, env
+        self.reads = dict((name, set()) for name in self.shared)
+        self.views, self.results = {}, {}
+
+    @classmethod
+    def name(self, consumer):
+        if consumer is None or isinstance(consumer, string_types):
+            return consumer
+        return '%s:%s' % (consumer.name, consumer.path)
+
+    @classmethod
+    def record(self, consumer):
+        """Return a context manager that records all reads of the current
+        thread for `consumer`, a view, ``'filters'`` or ``'readers'``.  Reads
+        within ``tracker.record(None)`` are not recorded."""
+
+        name = self.name(consumer)
+        if name is None:
+            return Recorder(None)
+
+        if not isinstance(consumer, string_types):
+            self.views[name] = consumer
+        return Recorder(self.reads.setdefault(name, set()))
+
+    @classmethod
+    def read(self, ns, key):
+        keys = getattr(self.local, 'keys', None)
+        if keys is not None:
+            keys.add((ns, key))
+
+    @classmethod
+    def digest(self, ns, key):
+        if ns == 'view':
+            view = self.views.get(key)
+            if view is None:
+                return -2
+            return hash(view.name, view.path, HashableList(view.filters),
+                        Configuration(view._getkwargs()))
+
+        return (self.conf if ns == 'conf' else self.env).digest(key)
+
+    @classmethod
+    def modified(self, view):
+        """Return whether `view` itself (its route, filters and options), a
+        key of `conf` or `env` it read or a key read by any filter or reader
+        during the previous compilation has changed."""
+
+        name = self.name(view)
+        if name not in self.results:
+            self.views[name] = view
+            records = cache.memoize.get('tracker') or {}
+
+            rv = False
+            for consumer in (name, ) + self.shared:
+                if consumer not in records:
+                    rv = True
+                    break
+                if any(self.digest(ns, key) != value
+                       for (ns, key), value in iteritems(records[consumer])):
+                    rv = True
+                    break
+
+            self.results[name] = rv
+        return self.results[name]
+
+    @classmethod
+    def collect(self):
+        """Return and reset the reads of filters, used to pass them from
+        worker processes to the main process via :meth:`merge`."""
+
+        rv, self.reads['filters'] = self.reads.get('filters', set()), set()
+        return rv
+
+    @classmethod
+    def merge(self, reads):
+        self.reads.setdefault('filters', set()).update(reads)
+
+    @classmethod
+    def save(self):
+        """Remember the current value of every key recorded now or during
+        previous compilations for the next compilation."""
+
+        if self.conf is None:
+            return
+
+        records = cache.memoize.get('tracker') or {}
+        self.reads['filters'].add(('env', 'filters'))
+
+        rv = {}
+        for name in set(self.reads) | set(self.views):
+            keys = set(records.get(name, ())) | self.reads.get(name, set())
+            if name in self.views:
+                # views receive all entries, pages etc. which are also in env.globals
+                keys.update([('view', name), ('env', 'globals')])
+            rv[name] = dict((key, self.digest(*key)) for key in keys)
+
+        cache.memoize['tracker'] = rv
@@ -9,9 +9,11 @@ import traceback
 
 from os.path import join, dirname, basename
 
-from acrylamid import log, helpers, compat
+from acrylamid import log, helpers, compat, profiler
+from acrylamid.core import tracker
 from acrylamid.errors import AcrylamidException
 from acrylamid.compat import string_types, filter
+from acrylamid.lib.html import Events
 from acrylamid.lib.lazy import _demandmod as LazyModule
 
 # module-level variable to store all used filters during compilation
@@ -115,8 +117,9 @@ class meta(type):
             return func
 
         init = dct.get('init', lambda s, x, y: None)
-        transform = lambda cls, x, y, *z: initialize(
-            cls, dct.get('transform', bases[0].transform))(cls, x, y, *z)
+        def transform(cls, x, y, *z):
+            with profiler.timed('filter:' + cls.name), tracker.record('filters'):
+                return initialize(cls, dct.get('transform', bases[0].transform))(cls, x, y, *z)
 
         super(meta, cls).__init__(name, bases, dct)
         setattr(cls, 'init', init)
@@ -182,6 +185,13 @@ class Filter(compat.metaclass(meta, object)):
        of the filter yourself, as ``conf.fetch(self.cname)`` is automatically
        included into the filter hash.
 
+    .. attribute:: stream
+
+       Set to True if :func:`transform` also accepts and then returns
+       :class:`acrylamid.lib.html.Events` instead of a string, which is the
+       case for filters using :attr:`acrylamid.lib.html.HTMLParser.output`.
+       Consecutive stream filters share a single parse of the HTML.
+
     .. method:: init(self, conf, env)
 
        At demand initialization. A filter gets only initialized when he's
@@ -207,9 +217,20 @@ class Filter(compat.metaclass(meta, object)):
        :param content: a text you can modify
        :param entry: current :class:`readers.Entry`
        :param args: a list of additional arguments
+
+    .. method:: prefetch(self, entries)
+
+       Called once per compilation with all entries that are going to be
+       (re-)compiled, before any :func:`transform`.  A filter may convert the
+       content of many entries at once here, e.g. in a single run of an
+       external program, and return the results in :func:`transform` later.
+       Note that :func:`init` has not necessarily been called yet.
+
+       :param entries: list of :class:`readers.Entry` using this filter or not
     """
 
     initialized = False
+    stream = False
     conflicts = []
     priority = 50.0
     version = 1
@@ -241,6 +262,27 @@ class Filter(compat.metaclass(meta, object)):
     def uses(self):
         return ''
 
+    def prefetch(self, entries):
+        pass
+
+
+def chain(fxs, content, entry):
+    """Apply the filters `fxs` to `content` in order.  Consecutive
+    :attr:`Filter.stream` filters operate on events so that the HTML is
+    parsed once and serialized once."""
+
+    for i, f in enumerate(fxs):
+        if f.stream:
+            if not isinstance(content, Events) and i + 1 < len(fxs) and fxs[i+1].stream:
+                content = Events.fromstring(content)
+        elif isinstance(content, Events):
+            content = content.serialize()
+        content = f.transform(content, entry, *f.args)
+
+    if isinstance(content, Events):
+        return content.serialize()
+    return content
+
 
 def disable(fx):
     """Disable :class:`Filter` safely."""
@@ -13,26 +13,83 @@
 import os
 import io
 import re
+import json
+import hashlib
 
 from acrylamid import log
-from acrylamid.compat import iteritems, filter
+from acrylamid.core import cache
 from acrylamid.filters import Filter
 
 from acrylamid.lib.html import HTMLParser
 
+# an acronym is a literal unless it contains special characters
+r_special = re.compile(r'[.^$*+?{}\[\]\\|()]')
+
+
+def factor(words):
+    """Return a regular expression that matches any of `words` (literal
+    strings), factored by common prefixes like a trie.  Matching such an
+    expression is almost independent of the number of words, whereas a
+    plain alternation tries each word at every position.  Longer words are
+    preferred over their prefixes.
+
+    >>> factor(['OS', 'OSI', 'OSS'])
+    'OS[IS]?'"""
+
+    tree = {}
+    for word in words:
+        node = tree
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+
+        chars = sorted(char for char in node if char)
+        alts = [re.escape(char) + build(node[char]) for char in chars]
+        if not alts:
+            return ''
+
+        # single characters without a continuation form a character class
+        leaves = all(node[char] == {'': {}} for char in chars)
+
+        if len(alts) > 1 and leaves:
+            rv = '[%s]' % ''.join(alts)
+        elif len(alts) == 1 and ('' not in node or leaves):
+            rv = alts[0]
+        else:
+            rv = '(?:%s)' % '|'.join(alts)
+
+        return rv + '?' if '' in node else rv
+
+    return build(tree)
+
 
 class Acrynomify(HTMLParser):
 
+    protected = frozenset(['pre', 'code', 'math', 'script'])
+
     def __init__(self, html, abbr, repl):
         self.abbr = abbr
         self.repl = repl
+        self.depth = 0  # number of protected tags in stack
 
         HTMLParser.__init__(self, html)
 
+    def handle_starttag(self, tag, attrs):
+
+        if tag in self.protected:
+            self.depth += 1
+        HTMLParser.handle_starttag(self, tag, attrs)
+
+    def handle_endtag(self, tag):
+
+        if self.stack and self.stack[-1] in self.protected:
+            self.depth -= 1
+        HTMLParser.handle_endtag(self, tag)
+
     def handle_data(self, data):
-        if any(filter(lambda i: i in self.stack, ['pre', 'code', 'math', 'script'])):
-            pass
-        else:
+        if not self.depth:
             data = self.abbr.sub(self.repl, data)
         self.result.append(data)
 
@@ -40,10 +97,11 @@ class Acrynomify(HTMLParser):
 class Acronyms(Filter):
 
     match = [re.compile('^Acronyms?$', re.I), 'abbr', 'Abbr']
-    version = 2
+    version = 3
 
     # after Typography, so CAPS is around ABBR
     priority = 20.0
+    stream = True
 
     @property
     def uses(self):
@@ -54,6 +112,29 @@ class Acronyms(Filter):
 
     def init(self, conf, env):
 
+        if conf.get('acronyms_file', None):
+            key = (conf['acronyms_file'], os.path.getmtime(conf['acronyms_file']))
+        else:
+            key = ACRONYMS
+
+        # the parsed acronyms and the factored expression, see :meth:`compile`
+        path = 'acronyms-' + hashlib.md5(repr((self.version, key)).encode('utf-8')).hexdigest()
+        rv = cache.get(path, 'acronyms') if cache.backend is not None else None
+
+        if rv is None:
+            rv = self.compile(conf)
+            if cache.backend is not None:
+                cache.set(path, 'acronyms', json.dumps(rv))
+        else:
+            rv = json.loads(rv)
+
+        self.acronyms, self.pattern = rv
+        self.matchers = {}
+
+    def compile(self, conf):
+        """Parse the acronyms into a list of (pattern, description) pairs and
+        return it with a regular expression that matches any of them."""
+
         if conf.get('acronyms_file', None):
             with io.open(conf['acronyms_file'], 'r', encoding='utf-8') as fp:
                 data = fp.readlines()
@@ -61,8 +142,11 @@ class Acronyms(Filter):
             global ACRONYMS
             data = ACRONYMS.split('\n')
 
-        acronyms = {}
+        acronyms = []
         for line in data:
+            if not line.strip():
+                continue
+
             line = line.split("=", 1)
             firstpart = line[0].strip()
 
@@ -74,35 +158,62 @@ class Acronyms(Filter):
             elif secondpart.startswith("acronym|"):
                 secondpart = secondpart[8:]
 
-            acronyms[re.compile(firstpart)] = secondpart
+            acronyms.append((firstpart, secondpart))
 
-        self.acronyms = acronyms
+        return acronyms, self.expression(acronyms)
 
-    def transform(self, text, entry, *args):
+    def expression(self, acronyms):
+
+        literals = [pat for pat, desc in acronyms if not r_special.search(pat)]
+        patterns = [pat for pat, desc in acronyms if r_special.search(pat)]
 
-        acros = self.acronyms
-        if len(args) > 0:
-            acros = dict(filter(lambda k: any(k[0] == v for v in args), iteritems(acros)))
+        return r'\b(?:%s)\b' % '|'.join(([factor(literals)] if literals else []) + patterns)
+
+    def matcher(self, args):
+        """Return the compiled expression, the descriptions of literal acronyms
+        and a list of compiled (pattern, description) pairs for `args`."""
 
         try:
-            abbr = re.compile(r'\b(%s)\b' % '|'.join((pat.pattern for pat in acros)))
+            return self.matchers[args]
+        except KeyError:
+            pass
+
+        acronyms = self.acronyms
+        if args:
+            acronyms = [(pat, desc) for pat, desc in acronyms if pat in args]
+
+        try:
+            abbr = re.compile(self.pattern if not args else self.expression(acronyms))
         except re.error as e:
             log.warn("acronyms: %s", e.args[0])
+            abbr = None
+
+        literals = dict((pat, desc) for pat, desc in acronyms
+                        if not r_special.search(pat))
+        patterns = [(re.compile(r'(?:%s)\Z' % pat), desc) for pat, desc in acronyms
+                    if r_special.search(pat)]
+
+        return self.matchers.setdefault(args, (abbr, literals, patterns))
+
+    def transform(self, text, entry, *args):
+
+        abbr, literals, patterns = self.matcher(args)
+        if abbr is None or not (literals or patterns):
+            return text
 
         def repl(match):
 
             abbr = match.group(0)
-            desc = acros.get(abbr, None)
+            desc = literals.get(abbr, None)
 
             if desc is None:
-                for pat in acros:
+                for pat, desc in patterns:
                     if pat.match(abbr):
-                        desc = acros.get(pat)
                         break
             return '<abbr title="%s">%s</abbr>' % (desc, abbr)
 
         try:
-            return ''.join(Acrynomify(text, abbr, repl).result)
+            return Acrynomify(text, abbr, repl).output
         except:
             log.exception('could not acronymize ' + entry.filename)
             return text
@@ -3,16 +3,24 @@
 # License: BSD Style, 2 clauses -- see LICENSE.
 
 from acrylamid import log, utils
+from acrylamid.core import cache
 from acrylamid.filters import Filter
-from acrylamid.compat import filter, text_type as str
+from acrylamid.compat import text_type as str
 
 from acrylamid.lib.html import HTMLParser
 
 import os
 import io
 import re
+import json
+import hashlib
+import threading
 
-from os.path import join, dirname, basename
+from os.path import join, dirname, basename, getmtime
+
+# hyphenate_word per language, see :func:`build`
+hyphenators = {}
+lock = threading.Lock()
 
 
 class HyphenPatternNotFound(Exception):
@@ -37,11 +45,16 @@ class Hyphenator:
 
     __version__ = '1.0.20070709'
 
-    def __init__(self, chars, patterns, exceptions=''):
-        self.chars = unicode('[.' + re.escape(chars) + ']')
-        self.tree = {}
-        for pattern in patterns.split():
-            self._insert_pattern(pattern)
+    def __init__(self, chars, patterns, exceptions='', tree=None, maxsize=4096):
+        self.chars = str('[.' + re.escape(chars) + ']')
+        self.words = utils.LRU(maxsize)
+
+        if tree is not None:
+            self.tree = tree
+        else:
+            self.tree = {}
+            for pattern in patterns.split():
+                self._insert_pattern(pattern)
 
         self.exceptions = {}
         for ex in exceptions.split():
@@ -56,21 +69,28 @@ class Hyphenator:
 
         # Insert the pattern into the tree.  Each character finds a dict
         # another level down in the tree, and leaf nodes have the list of
-        # points.
+        # points (stored at '' instead of None to survive JSON).
         t = self.tree
         for c in chars:
             if c not in t:
                 t[c] = {}
             t = t[c]
-        t[None] = points
+        t[''] = points
 
     def hyphenate_word(self, word):
         """ Given a word, returns a list of pieces, broken at the possible
-            hyphenation points.
+            hyphenation points.  Recently hyphenated words are memoized.
         """
         # Short words aren't hyphenated.
         if len(word) <= 4:
             return [word]
+
+        pieces = self.words.get(word)
+        if pieces is None:
+            pieces = self.words.set(word, self._hyphenate_word(word))
+        return pieces
+
+    def _hyphenate_word(self, word):
         # If the word is an exception, get the stored points.
         if word.lower() in self.exceptions:
             points = self.exceptions[word.lower()]
@@ -82,8 +102,8 @@ class Hyphenator:
                 for c in work[i:]:
                     if c in t:
                         t = t[c]
-                        if None in t:
-                            p = t[None]
+                        if '' in t:
+                            p = t['']
                             for j in range(len(p)):
                                 points[i + j] = max(points[i + j], p[j])
                     else:
@@ -104,30 +124,45 @@ class Separator(HTMLParser):
     """helper class to apply Hyphenator to each word except in pre, code,
     math and em tags."""
 
+    protected = frozenset(['pre', 'code', 'math', 'script'])
+
     def __init__(self, html, hyphenationfunc, length=10):
         self.hyphenate = hyphenationfunc
         self.length = length
 
+        # maximal runs of word characters longer than `length`
+        self.words = re.compile(r"[^.:,\s!?+=\(\)/-]{%i,}" % (length + 1))
+        self.depth = 0  # number of protected tags in stack
+
         HTMLParser.__init__(self, html)
 
+    def handle_starttag(self, tag, attrs):
+
+        if tag in self.protected:
+            self.depth += 1
+        HTMLParser.handle_starttag(self, tag, attrs)
+
+    def handle_endtag(self, tag):
+
+        if self.stack and self.stack[-1] in self.protected:
+            self.depth -= 1
+        HTMLParser.handle_endtag(self, tag)
+
     def handle_data(self, data):
         """Hyphenate words longer than 10 characters."""
 
-        if any(filter(lambda i: i in self.stack, ['pre', 'code', 'math', 'script'])):
-            pass
-        else:
-            split = [word for word in re.split(r"[.:,\s!?+=\(\)/-]+", data)
-                     if len(word) > self.length]
-            for word in split:
-                hyphenated = '&shy;'.join(self.hyphenate(word))
-                data = data.replace(word, hyphenated)
+        if not self.depth:
+            data = self.words.sub(lambda m: '&shy;'.join(self.hyphenate(m.group())), data)
 
         self.result.append(data)
 
 
 def build(lang):
     """build the Hyphenator from given language.  If you want add more, see
-    http://tug.org/svn/texhyphen/trunk/hyph-utf8/tex/generic/hyph-utf8/patterns/txt/ ."""
+    http://tug.org/svn/texhyphen/trunk/hyph-utf8/tex/generic/hyph-utf8/patterns/txt/ .
+
+    Hyphenators are built once per language and process; the pattern tree is
+    also saved to the cache as JSON which loads faster than the patterns."""
 
     def gethyph(lang, directory='hyph/', prefix='hyph-'):
 
@@ -139,28 +174,61 @@ def build(lang):
         else:
             raise HyphenPatternNotFound("no hyph-definition found for '%s'" % lang)
 
+    try:
+        return hyphenators[lang]
+    except KeyError:
+        pass
+
     dir = os.path.join(dirname(__file__), 'hyph/')
     fpath = gethyph(lang, dir).rsplit('.', 2)[0]
     try:
         with io.open(fpath + '.chr.txt', encoding='utf-8') as f:
             chars = ''.join([line[0] for line in f.readlines()])
-        with io.open(fpath + '.pat.txt', encoding='utf-8') as f:
-            patterns = f.read()
-    except IOError:
+        key = 'hyphenation-' + hashlib.md5(repr((basename(fpath), Hyphenator.__version__,
+            getmtime(fpath + '.pat.txt'))).encode('utf-8')).hexdigest()
+        tree = load(key)
+        if tree is None:
+            with io.open(fpath + '.pat.txt', encoding='utf-8') as f:
+                patterns = f.read()
+    except (IOError, OSError):
         raise HyphenPatternNotFound('hyph/%s.chr.txt or hyph/%s.pat.txt missing' % (lang, lang))
 
-    hyphenator = Hyphenator(chars, patterns, exceptions='')
-    del patterns
-    del chars
-    log.debug("built Hyphenator from <%s>" % basename(fpath))
-    return hyphenator.hyphenate_word
+    if tree is None:
+        hyphenator = Hyphenator(chars, patterns, exceptions='')
+        save(key, hyphenator.tree)
+        del patterns
+        log.debug("built Hyphenator from <%s>" % basename(fpath))
+    else:
+        hyphenator = Hyphenator(chars, '', tree=tree)
+        log.debug("loaded Hyphenator for <%s> from cache" % basename(fpath))
+
+    with lock:
+        return hyphenators.setdefault(lang, hyphenator.hyphenate_word)
+
+
+def load(key):
+    """Return the pattern tree saved as `key` or None."""
+
+    if cache.backend is None:
+        return None
+
+    rv = cache.get(key, 'tree')
+    if rv is not None:
+        return json.loads(rv)
+
+
+def save(key, tree):
+
+    if cache.backend is not None:
+        cache.set(key, 'tree', json.dumps(tree, separators=(',', ':')))
 
 
 class Hyphenate(Filter):
 
     match = [re.compile('^(H|h)yph')]
-    version = 2
+    version = 3
     priority = 20.0
+    stream = True
 
     @utils.cached_property
     def default(self):
@@ -173,14 +241,19 @@ class Hyphenate(Filter):
 
     def init(self, conf, env):
         self.conf = conf
+        self.hyphenators = {}
 
     def transform(self, content, entry, *args):
         if entry.lang != self.conf['lang']:
             try:
-                hyphenate_word = build(entry.lang.replace('_', '-'))
-            except HyphenPatternNotFound as e:
-                log.warn(e.args[0])
-                hyphenate_word = lambda x: [x]
+                hyphenate_word = self.hyphenators[entry.lang]
+            except KeyError:
+                try:
+                    hyphenate_word = build(entry.lang.replace('_', '-'))
+                except HyphenPatternNotFound as e:
+                    log.warn(e.args[0])
+                    hyphenate_word = lambda x: [x]
+                self.hyphenators[entry.lang] = hyphenate_word
         else:
             hyphenate_word = self.default
 
@@ -192,7 +265,7 @@ class Hyphenate(Filter):
             length = 10
 
         try:
-            return ''.join(Separator(content, hyphenate_word, length=length).result)
+            return Separator(content, hyphenate_word, length=length).output
         except:
             log.exception('could not hyphenate ' + entry.filename)
             return content
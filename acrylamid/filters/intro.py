@@ -5,7 +5,8 @@
 
 from acrylamid import log, helpers
 from acrylamid.filters import Filter
-from acrylamid.lib.html import HTMLParser
+from acrylamid.filters.summarize import breaks, keywords
+from acrylamid.lib.html import HTMLParser, StopParsing
 
 
 class Introducer(HTMLParser):
@@ -17,6 +18,7 @@ class Introducer(HTMLParser):
         self.paragraphs = 0
         self.options = options
         self.href = href
+        self.breaks = breaks(html)
 
         super(Introducer, self).__init__(html)
 
@@ -39,10 +41,18 @@ class Introducer(HTMLParser):
             super(Introducer, self).handle_endtag(tag)
 
             if self.paragraphs == self.maxparagraphs:
-                for x in self.stack[:]:
-                    self.result.append('</%s>' % self.stack.pop())
-                if self.options['link'] != '':
-                    self.result.append(self.options['link'] % self.href)
+                self.finish()
+
+    def finish(self):
+        """Close all open tags, append the link and skip the remaining HTML."""
+
+        self.paragraphs = self.maxparagraphs
+        for x in self.stack[:]:
+            self.result.append('</%s>' % self.stack.pop())
+        if self.options['link'] != '':
+            self.result.append(self.options['link'] % self.href)
+
+        raise StopParsing
 
     def handle_startendtag(self, tag, attrs):
         if self.paragraphs < self.maxparagraphs and tag not in self.options['ignore']:
@@ -58,14 +68,17 @@ class Introducer(HTMLParser):
 
     def handle_comment(self, comment):
         if self.paragraphs < self.maxparagraphs:
+            if self.breaks and [word for word in keywords if word in comment.lower()]:
+                self.finish()
             super(Introducer, self).handle_comment(comment)
 
 
 class Introduction(Filter):
 
     match = ['intro', ]
-    version = 2
+    version = 3
     priority = 15.0
+    stream = True
 
     defaults = {
         'ignore': ['img', 'video', 'audio'],
@@ -93,8 +106,8 @@ class Introduction(Filter):
             maxparagraphs = 1
 
         try:
-            return ''.join(Introducer(
-                content, maxparagraphs, self.env.path+entry.permalink, options).result)
+            return Introducer(
+                content, maxparagraphs, self.env.path+entry.permalink, options).output
         except:
             log.exception('could not extract intro from ' + entry.filename)
             return content
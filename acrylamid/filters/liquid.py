@@ -3,15 +3,12 @@
 # Copyright 2013 Martin Zimmermann <info@posativ.org>. All rights reserved.
 # License: BSD Style, 2 clauses -- see LICENSE.
 
-import io
 import re
 import json
-import pickle
+import time
+import threading
 
-from os.path import join
-from functools import partial
-
-from acrylamid import core, utils, lib
+from acrylamid import log
 from acrylamid.compat import PY2K, iteritems, text_type as str
 
 from acrylamid.core import cache
@@ -19,11 +16,11 @@ from acrylamid.utils import Struct
 from acrylamid.filters import Filter
 
 from acrylamid.lib import requests
+from acrylamid.lib._async import Threadpool
 
 if PY2K:
     from urllib import urlencode
     from urlparse import urlparse, parse_qs
-    import cPickle as pickle
 else:
     from urllib.parse import urlencode
     from urllib.parse import urlparse, parse_qs
@@ -144,11 +141,114 @@ def pullquote(header, body):
     return "Surround your pullquote like this {\" text to be quoted \"}"
 
 
-def tweet(header, body=None):
-    """Easy embedding of Tweets. The Twitter oEmbed API is rate-limited,
-    hence we are caching the response per configuration to `.cache/`."""
+class embeds(object):
+    """Responses of oEmbed APIs by request URL. They are kept in
+    :attr:`acrylamid.core.cache.memoize`, thus read once when the cache is
+    initialized and written once on :meth:`acrylamid.core.cache.shutdown`.
+
+    .. attribute:: ttl
+
+       Seconds until a response is fetched again, defaults to never.
+
+    .. attribute:: offline
+
+       Never fetch a response, but use expired ones.
+
+    .. attribute:: workers
+
+       Number of concurrent requests in :meth:`prefetch`."""
+
+    ttl = None
+    offline = False
+    workers = 8
+
+    lock = threading.Lock()
+
+    # requests that failed during this run
+    failed = {}
+
+    @classmethod
+    def storage(self):
+        with self.lock:
+            rv = cache.memoize('oembed')
+            if rv is None:
+                rv = {}
+                cache.memoize('oembed', rv)
+            return rv
+
+    @classmethod
+    def valid(self, url):
+        """Return True if the response for `url` is cached and not expired."""
+        try:
+            timestamp, html = self.storage()[url]
+        except KeyError:
+            return False
+        return self.ttl is None or time.time() - timestamp < self.ttl
+
+    @classmethod
+    def fetch(self, url):
+        """Fetch `url` and cache the HTML of the response. Errors are kept
+        until the next run and raised again by :meth:`get`."""
+
+        try:
+            html = json.loads(requests.get(url).read().decode('utf-8'))['html']
+        except (IOError, ValueError, KeyError) as e:
+            with self.lock:
+                self.failed[url] = e
+            raise
+
+        with self.lock:
+            self.storage()[url] = (time.time(), html)
+
+        return html
+
+    @classmethod
+    def get(self, url):
+        """Return the HTML of the (cached) response for `url`. An expired
+        response is used if it can not be fetched again."""
+
+        storage = self.storage()
 
-    oembed = 'https://api.twitter.com/1/statuses/oembed.json'
+        if url in storage and (self.offline or self.valid(url)):
+            return storage[url][1]
+
+        if self.offline:
+            raise requests.URLError('offline, %s is not cached' % url)
+
+        try:
+            if url in self.failed:
+                raise self.failed[url]
+            return self.fetch(url)
+        except (IOError, ValueError, KeyError) as e:
+            if url not in storage:
+                raise
+            log.warn('%s: %s, using the expired response', e.__class__.__name__, e)
+            return storage[url][1]
+
+    @classmethod
+    def prefetch(self, urls):
+        """Fetch all `urls` that are not cached (or expired) concurrently."""
+
+        urls = [url for url in set(urls) if url not in self.failed and not self.valid(url)]
+        if self.offline or not urls:
+            return
+
+        def fetch(url):
+            try:
+                self.fetch(url)
+            except (IOError, ValueError, KeyError):
+                pass  # reported by the directive
+
+        pool = Threadpool(min(self.workers, len(urls)))
+        for url in urls:
+            pool.add_task(fetch, url)
+        pool.wait_completion()
+
+
+def oembed(header):
+    """Return the oEmbed request URL for a tweet directive."""
+
+    endpoint = 'https://api.twitter.com/1/statuses/oembed.json'
     args = list(map(str.strip, re.split(r'\s+', header)))
 
     params = Struct(url=args.pop(0))
@@ -158,31 +258,21 @@ def tweet(header, body=None):
             v = v.strip('\'')
         params[k] = v
 
-    try:
-        with io.open(join(core.cache.cache_dir, 'tweets'), 'rb') as fp:
-            cache = pickle.load(fp)
-    except (IOError, pickle.PickleError):
-        cache = {}
+    return endpoint + '?' + urlencode(params)
 
-    if params in cache:
-        body = cache[params]
-    else:
-        try:
-            body = json.loads(requests.get(oembed + '?' + urlencode(params)).read())['html']
-        except (requests.HTTPError, requests.URLError):
-            log.exception('unable to fetch tweet')
-            body = "Tweet could not be fetched"
-        except (ValueError, KeyError):
-            log.exception('could not parse response')
-            body = "Tweet could not be processed"
-        else:
-            cache[params] = body
+
+def tweet(header, body=None):
+    """Easy embedding of Tweets. The Twitter oEmbed API is rate-limited,
+    hence we are caching the response, see :class:`embeds`."""
 
     try:
-        with io.open(join(core.cache.cache_dir, 'tweets'), 'wb') as fp:
-            pickle.dump(cache, fp, pickle.HIGHEST_PROTOCOL)
-    except (IOError, pickle.PickleError):
-        log.exception('uncaught exception during pickle.dump')
+        body = embeds.get(oembed(header))
+    except IOError:
+        log.exception('unable to fetch tweet')
+        body = "Tweet could not be fetched"
+    except (ValueError, KeyError):
+        log.exception('could not parse response')
+        body = "Tweet could not be processed"
 
     return "<div class='embed tweet'>%s</div>" % body
 
@@ -198,17 +288,54 @@ class Liquid(Filter):
         'youtube': youtube
     }
 
+    # directives embedding an oEmbed response and their request URL
+    embedded = {'tweet': oembed}
+
+    blocks = {}
+
+    def init(self, conf, env):
+
+        embeds.ttl = conf.get('liquid_embed_ttl', None)
+        embeds.offline = conf.get('liquid_offline', False)
+
     def block(self, tag):
-        return re.compile(''.join([
+
+        try:
+            return self.blocks[tag]
+        except KeyError:
+            pass
+
+        rv = self.blocks[tag] = re.compile(''.join([
             r'{%% %s (.*?) ?%%}' % tag,
             '(?:',
                 '\n(.+?)\n',
                 r'{%% end%s %%}' % tag,
             ')?']), re.MULTILINE | re.DOTALL)
+        return rv
+
+    def prefetch(self, entries):
+        """Fetch uncached embeds (e.g. tweets) of `entries` concurrently."""
+
+        if not self.initialized:
+            self.init(self.conf, self.env)
+            self.initialized = True
+
+        embeds.failed, urls = {}, []
+        for entry in entries:
+            if not any(self in entry.filters.path(view)
+                       for view in entry.filters.views if view is not None):
+                continue
+
+            for tag, func in iteritems(self.embedded):
+                if '{%% %s ' % tag in entry.source:
+                    urls.extend(func(m.group(1)) for m in self.block(tag).finditer(entry.source))
+
+        embeds.prefetch(urls)
 
     def transform(self, text, entry, *args):
 
         for tag, func in iteritems(self.directives):
-            text = re.sub(self.block(tag), lambda m: func(*m.groups()), text)
+            if '{%% %s ' % tag in text:
+                text = self.block(tag).sub(lambda m: func(*m.groups()), text)
 
         return text
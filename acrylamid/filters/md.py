@@ -6,10 +6,17 @@
 import os
 import imp
 import markdown
+import threading
 
 from acrylamid.errors import AcrylamidException
 from acrylamid.compat import string_types
 from acrylamid.filters import Filter, discover
+from acrylamid.lib.highlight import highlight
+
+try:
+    from markdown.extensions import codehilite
+except ImportError:
+    codehilite = None  # NOQA
 
 
 class Markdown(Filter):
@@ -24,6 +31,10 @@ class Markdown(Filter):
         'tables', 'codehilite', 'def_list', 'extra', 'smart_strong', 'nl2br',
         'sane_lists', 'wikilink', 'attr_list'])
 
+    # idle converters per extension signature, see :meth:`acquire`
+    pool = {}
+    lock = threading.Lock()
+
     def init(self, conf, env):
 
         self.failed = []
@@ -31,6 +42,10 @@ class Markdown(Filter):
 
         markdown.Markdown  # raises ImportError eventually
 
+        # re-use highlighted code blocks, see acrylamid.lib.highlight
+        if codehilite is not None:
+            codehilite.highlight = highlight
+
         # -- discover markdown extensions --
         directories = conf['filters_dir'] + [os.path.dirname(__file__)]
         for filename in discover(directories, lambda path: path.startswith('mdx_')):
@@ -47,13 +62,9 @@ class Markdown(Filter):
             except (ImportError, Exception) as e:
                 self.failed.append('%r %s: %s' % (filename, e.__class__.__name__, e))
 
-    def __contains__(self, key):
-        return True if key in self.extensions else False
-
-    def transform(self, text, entry, *filters):
-
+        # -- resolve extensions once --
         val = []
-        for f in filters:
+        for f in self.args:
             if f in self:
                 val.append(f)
             else:
@@ -64,7 +75,40 @@ class Markdown(Filter):
                 elif not self.ignore:
                     raise AcrylamidException('Markdown: %s' % '\n'.join(self.failed))
 
-        return markdown.Markdown(
-            extensions=[self.extensions[m] for m in val],
-            output_format='xhtml5'
-        ).convert(text)
+        self.signature = tuple(self.extensions[m] for m in val)
+
+    def __contains__(self, key):
+        return True if key in self.extensions else False
+
+    def acquire(self):
+        """Return an idle converter with the same extensions or a new one."""
+
+        with Markdown.lock:
+            try:
+                return Markdown.pool.setdefault(self.signature, []).pop()
+            except IndexError:
+                pass
+
+        return markdown.Markdown(extensions=list(self.signature), output_format='xhtml5')
+
+    def release(self, md, patterns):
+        """Reset the converter and put it back into the pool.  Abbreviations
+        are added as inline patterns which :meth:`markdown.Markdown.reset`
+        does not remove, such converters are thrown away."""
+
+        if len(md.inlinePatterns) != patterns:
+            return
+
+        md.reset()
+        with Markdown.lock:
+            Markdown.pool[self.signature].append(md)
+
+    def transform(self, text, entry, *filters):
+
+        md = self.acquire()
+        patterns = len(md.inlinePatterns)
+
+        try:
+            return md.convert(text)
+        finally:
+            self.release(md, patterns)
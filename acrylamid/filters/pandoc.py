@@ -3,9 +3,77 @@
 # Copyright 2012 Martin Zimmermann <info@posativ.org>. All rights reserved.
 # License: BSD Style, 2 clauses -- see LICENSE.
 
+import re
+import uuid
+
+from acrylamid import log
 from acrylamid.filters import Filter
 from acrylamid.helpers import system
 from acrylamid.errors import AcrylamidException
+from acrylamid.lib._async import Threadpool
+
+#: input formats that pass the batch delimiter through as raw HTML
+BATCHABLE = ('markdown', 'commonmark', 'gfm')
+
+#: options that treat the input as a single document
+STANDALONE = frozenset(['standalone', 'self-contained', 'toc', 'table-of-contents',
+                        'number-sections', 'reference-links'])
+
+# footnotes, link reference definitions and example lists are document-wide
+r_global = re.compile(r'\[\^|^ {0,3}\[[^\]]+\]:|\(@', re.M)
+
+# ATX and setext headers, pandoc derives (unique) identifiers from them
+r_header = re.compile(r'^#{1,6}[ \t]+(.*?)[ \t#]*$|^(\S.*)\n(?:=+|-+)[ \t]*$', re.M)
+
+# shortcut, collapsed and full references, without a definition pandoc
+# resolves them to a header (implicit_header_references)
+r_reference = re.compile(r'\[([^\[\]]+)\](?:\[([^\[\]]*)\])?(?![(:])')
+
+
+def normalize(label):
+    return re.sub(r'\W', '', label, flags=re.U).lower()
+
+
+def headers(text):
+    """Return the normalized headers of `text` or None if `text` uses
+    document-wide constructs and must be converted on its own."""
+
+    if r_global.search(text):
+        return None
+
+    return frozenset(normalize(''.join(m.groups(''))) for m in r_header.finditer(text))
+
+
+def references(text):
+    """Return the normalized labels of all references in `text`."""
+
+    return frozenset(normalize(m.group(2) or m.group(1)) for m in r_reference.finditer(text))
+
+
+def batches(texts, size):
+    """Group `texts` into lists of at most `size` texts that do not share a
+    header nor refer to a header of another text, thus pandoc generates the
+    same identifiers and links as for a single text.  Texts that can not be
+    converted along with others are omitted."""
+
+    batch, used, refs = [], set(), set()
+    for text in texts:
+        keys = headers(text)
+        if keys is None:
+            continue
+
+        labels = references(text)
+        if len(batch) == size or keys & used or keys & refs or labels & used:
+            if len(batch) > 1:
+                yield batch
+            batch, used, refs = [], set(), set()
+
+        batch.append(text)
+        used |= keys
+        refs |= labels
+
+    if len(batch) > 1:
+        yield batch
 
 
 class Pandoc(Filter):
@@ -17,25 +85,89 @@ class Pandoc(Filter):
     priority = 70.0
 
     def init(self, conf, env):
-        self.ignore = env.options.ignore
 
-    def transform(self, text, entry, *args):
+        try:
+            system(['pandoc', '--version'])
+        except (OSError, AcrylamidException):
+            raise ImportError('Pandoc: pandoc not available')
+
+        self.results = {}
+
+    @property
+    def cmd(self):
+
+        fmt, extras = self.args[0], self.args[1:]
+        return ['pandoc', '-f', fmt, '-t', 'HTML'] + ['--'+x for x in extras]
+
+    def prefetch(self, entries):
+        """Convert the sources of `entries` in batches of ``PANDOC_BATCH``
+        texts, each in a single pandoc run using up to ``--jobs`` processes.
+        Only Markdown is converted in batches, the remaining texts (and
+        batches pandoc fails on) are converted individually by
+        :func:`transform`."""
+
+        if not self.initialized:
+            try:
+                self.init(self.conf, self.env)
+                self.initialized = True
+            except ImportError:
+                return  # handled on first transform
+
+        self.results = {}
+        size = self.conf.get('pandoc_batch', 32)
+
+        if not self.args or size < 2 or STANDALONE.intersection(self.args[1:]):
+            return
+
+        if not self.args[0].lower().startswith(BATCHABLE):
+            return
+
+        texts = set()
+        for entry in entries:
+            for view in entry.filters.views:
+                if view is not None and entry.filters.path(view)[:1] == [self]:
+                    texts.add(entry.source)
+
+        jobs = list(batches(sorted(texts), size))
+        if not jobs:
+            return
+
+        pool = Threadpool(max(1, min(self.env.options.jobs, len(jobs))))
+        for batch in jobs:
+            pool.add_task(self.convert, batch)
+        pool.wait_completion()
+
+    def convert(self, texts):
+        """Convert `texts` in a single pandoc run.  A unique HTML comment
+        separates the texts and splits pandoc's output again."""
+
+        marker = '<!-- acrylamid-%s -->' % uuid.uuid4().hex
 
         try:
-            system(['which', 'pandoc'])
-        except AcrylamidException:
-            if self.ignore:
-                return text
-            raise AcrylamidException('Pandoc: pandoc not available')
+            html = system(self.cmd, stdin=('\n\n%s\n\n' % marker).join(texts))
+        except (OSError, AcrylamidException) as e:
+            log.debug('pandoc batch failed: %s', e.args[0] if e.args else e)
+            return
+
+        parts = html.split(marker)
+        if len(parts) != len(texts):
+            log.debug('pandoc batch failed: delimiter not preserved')
+            return
+
+        for text, part in zip(texts, parts):
+            self.results[text] = part.strip()
+
+    def transform(self, text, entry, *args):
 
         if len(args) == 0:
             raise AcrylamidException("pandoc filter takes one or more arguments")
 
-        fmt, extras = args[0], args[1:]
-        cmd = ['pandoc', '-f', fmt, '-t', 'HTML']
-        cmd.extend(['--'+x for x in extras])
+        try:
+            return self.results[text]
+        except KeyError:
+            pass
 
         try:
-            return system(cmd, stdin=text)
+            return system(self.cmd, stdin=text)
         except OSError as e:
             raise AcrylamidException(e.msg)
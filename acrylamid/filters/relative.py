@@ -39,6 +39,7 @@ class Relative(Filter):
     match = ['relative']
     version = 1
     priority = 15.0
+    stream = True
 
     def transform(self, text, entry, *args):
 
@@ -50,7 +51,7 @@ class Relative(Filter):
             return joinurl(entry.permalink, part)
 
         try:
-            return ''.join(Href(text, relatively).result)
+            return Href(text, relatively).output
         except:
             log.warn('%s: %s in %s' % (e.__class__.__name__, e.msg, entry.filename))
             return text
@@ -61,6 +62,7 @@ class Absolute(Filter):
     match = ['absolute']
     version = 2
     priority = 15.0
+    stream = True
 
     @property
     def uses(self):
@@ -79,7 +81,7 @@ class Absolute(Filter):
             return self.conf.www_root + joinurl(entry.permalink, part)
 
         try:
-            return ''.join(Href(text, absolutify).result)
+            return Href(text, absolutify).output
         except:
             log.warn('%s: %s in %s' % (e.__class__.__name__, e.msg, entry.filename))
             return text
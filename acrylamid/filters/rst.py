@@ -6,6 +6,7 @@
 import sys
 import os
 import imp
+import threading
 import traceback
 
 from distutils.version import LooseVersion
@@ -14,7 +15,8 @@ from acrylamid import log
 from acrylamid.filters import Filter, discover
 
 try:
-    from docutils.core import publish_parts, __version__ as version
+    from docutils.core import Publisher, publish_parts, __version__ as version
+    from docutils.io import StringInput, StringOutput
     from docutils.parsers.rst import roles, directives
 except ImportError:
     publish_parts = roles = directives = None  # NOQA
@@ -28,6 +30,16 @@ class Restructuredtext(Filter):
     conflicts = ['markdown', 'plain']
     priority = 70.00
 
+    settings = {
+        'initial_header_level': 1,
+        'doctitle_xform': 0,
+        'syntax_highlight': 'short'
+    }
+
+    # idle publishers, see :meth:`acquire`
+    pool = []
+    lock = threading.Lock()
+
     def init(self, conf, env):
 
         self.extensions = {}
@@ -52,13 +64,37 @@ class Restructuredtext(Filter):
                 traceback.print_exc(file=sys.stdout)
                 log.warn('%r %s: %s' % (filename, e.__class__.__name__, e))
 
+    def acquire(self):
+        """Return an idle publisher or a new one.  Setting up the components
+        and especially the settings (which builds a complete option parser) is
+        far more expensive than converting a usual blog post."""
+
+        with Restructuredtext.lock:
+            try:
+                return Restructuredtext.pool.pop()
+            except IndexError:
+                pass
+
+        pub = Publisher(source_class=StringInput, destination_class=StringOutput)
+        pub.set_components('standalone', 'restructuredtext', 'html')
+        pub.process_programmatic_settings(None, self.settings, None)
+
+        return pub
+
+    def release(self, pub):
+
+        pub.document = None
+        with Restructuredtext.lock:
+            Restructuredtext.pool.append(pub)
+
     def transform(self, content, entry, *filters):
 
-        settings = {
-            'initial_header_level': 1,
-            'doctitle_xform': 0,
-            'syntax_highlight': 'short'
-        }
+        pub = self.acquire()
 
-        parts = publish_parts(content, writer_name='html', settings_overrides=settings)
-        return parts['body']
+        try:
+            pub.set_source(content)
+            pub.set_destination()
+            pub.publish()
+            return pub.writer.parts['body']
+        finally:
+            self.release(pub)
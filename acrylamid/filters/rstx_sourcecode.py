@@ -3,8 +3,34 @@
 # Copyright 2012 Martin Zimmermann <info@posativ.org>. All rights reserved.
 # License: BSD Style, 2 clauses -- see LICENSE.
 
+import json
+import docutils
+
+from docutils.utils import code_analyzer
 from docutils.parsers.rst.directives import body
 
+from acrylamid.lib.highlight import fetch
+
+
+class Lexer(code_analyzer.Lexer):
+    """Cache the classified tokens of a code block, see
+    :mod:`acrylamid.lib.highlight`."""
+
+    def __iter__(self):
+
+        if self.lexer is None:
+            return super(Lexer, self).__iter__()
+
+        key = ('docutils', docutils.__version__, self.language, self.tokennames,
+               sorted(self.lexer.options.items()), self.code)
+        rv = fetch(key, lambda: json.dumps(list(super(Lexer, self).__iter__())))
+        return iter([(classes, value) for classes, value in json.loads(rv)])
+
+
 def register(roles, directives):
+
+    # used by docutils' code directive
+    body.Lexer = Lexer
+
     for name in 'code-block', 'sourcecode', 'pygments':
         directives.register_directive(name, body.CodeBlock)
@@ -3,10 +3,32 @@
 # Copyright 2012 Martin Zimmermann <info@posativ.org>. All rights reserved.
 # License: BSD Style, 2 clauses -- see LICENSE.
 
+import re
+
 from acrylamid import log, helpers
 from acrylamid.filters import Filter
 
-from acrylamid.lib.html import HTMLParser
+from acrylamid.lib.html import HTMLParser, Events, StopParsing
+
+#: keywords of comments that end a summary (or introduction) preliminary
+keywords = ['excerpt', 'summary', 'break', 'more']
+
+# comments and bogus comments (e.g. ``<!more>``) that may contain a keyword
+r_comment = re.compile(r'<(?:!|/[^a-zA-Z])')
+r_break = re.compile(r'<(?:!--(?:(?!-->).)*?|[!/][^>]*?)(?:%s)' % '|'.join(keywords),
+                     re.I | re.S)
+
+
+def breaks(html):
+    """Cheap pre-scan whether `html` (may) contain a break comment such as
+    ``<!-- more -->``."""
+
+    if isinstance(html, Events):
+        if html.source is None:
+            return True
+        html = html.source
+
+    return any(r_break.match(html, m.start()) for m in r_comment.finditer(html))
 
 
 class Summarizer(HTMLParser):
@@ -18,9 +40,17 @@ class Summarizer(HTMLParser):
 
         self.words = 0
         self.maxwords = maxwords
+        self.breaks = breaks(text)
 
         HTMLParser.__init__(self, text)
 
+    def stop(self):
+        """Skip the remaining HTML once the summary is complete: the word limit
+        is reached, all tags are closed and the link has been inserted."""
+
+        if self.words >= self.maxwords and not self.stack and not self.mode > -1:
+            raise StopParsing
+
     def handle_starttag(self, tag, attrs):
         # Apply and stack each tag until we reach maxword.
         if self.words < self.maxwords:
@@ -45,6 +75,8 @@ class Summarizer(HTMLParser):
                 self.insert_link()
                 self.mode = -1
 
+        self.stop()
+
     def handle_endtag(self, tag):
         # If we are behind the word limit, append out link in various modes, else append tag
         if self.words < self.maxwords:
@@ -71,6 +103,8 @@ class Summarizer(HTMLParser):
             if self.mode == 2:
                 self.insert_link()
 
+            self.stop()
+
     def insert_link(self):
         if '%s' in self.options['link']:
             self.result.append(self.options['link'] % self.href)
@@ -89,8 +123,9 @@ class Summarizer(HTMLParser):
         if self.words < self.maxwords:
             super(Summarizer, self).handle_charref(char)
 
-    def handle_comment(self, comment, keywords=['excerpt', 'summary', 'break', 'more']):
-        if self.words < self.maxwords and [word for word in keywords if word in comment.lower()]:
+    def handle_comment(self, comment, keywords=keywords):
+        if self.breaks and self.words < self.maxwords and \
+                [word for word in keywords if word in comment.lower()]:
             self.words = self.maxwords
 
 
@@ -100,6 +135,7 @@ class Summarize(Filter):
     match = ['summarize', 'sum']
     version = 3
     priority = 15.0
+    stream = True
 
     defaults = {
         'mode': 1,
@@ -128,8 +164,8 @@ class Summarize(Filter):
             maxwords = 100
 
         try:
-            return ''.join(Summarizer(
-                content, maxwords, self.env.path+entry.permalink, options).result)
+            return Summarizer(
+                content, maxwords, self.env.path+entry.permalink, options).output
         except:
             log.exception('could not summarize ' + entry.filename)
             return content
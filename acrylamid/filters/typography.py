@@ -14,6 +14,10 @@
 # typopgraphy.py offers a custom mode, "a", that don't educate dashes when written
 # without space like *--bare* or *foo--* using mode "2".
 #
+# All enabled filters are applied by a :class:`Typesetter` in a single pass over
+# the tokens of the HTML -- the output is the same as applying the functions
+# below one after another.
+#
 # [1]: https://github.com/mintchaos/typogrify
 # [2]: http://web.chad.org/projects/smartypants.py/
 
@@ -22,6 +26,58 @@ import smartypants
 
 from acrylamid.filters import Filter
 
+#: filters in the order they are applied
+FILTERS = ('amp', 'widont', 'smartypants', 'caps', 'initial_quotes', 'number_suffix')
+
+# tag_pattern from http://haacked.com/archive/2004/10/25/usingregularexpressionstomatchhtml.aspx
+# it kinda sucks but it fixes the standalone amps in attributes bug
+tag_pattern = r'''</?\w+((\s+\w+(\s*=\s*(?:".*?"|'.*?'|[^'">\s]+))?)+\s*|\s*)/?>'''
+
+r_tag = re.compile(tag_pattern)
+r_amp = re.compile(r"(\s|&nbsp;)(&|&amp;|&\#38;)(\s|&nbsp;)")
+r_intra_tag = re.compile(r'(?P<prefix>(%s)?)(?P<text>([^<]*))(?P<suffix>(%s)?)' % (tag_pattern, tag_pattern))
+
+r_caps = re.compile(r"""(
+                    (\b[A-Z\d]*        # Group 2: Any amount of caps and digits
+                    [A-Z]\d*[A-Z]      # A cap string must at least include two caps (but they can have digits between them)
+                    [A-Z\d']*\b)       # Any amount of caps and digits or dumb apostsrophes
+                    | (\b[A-Z]+\.\s?   # OR: Group 3: Some caps, followed by a '.' and an optional space
+                    (?:[A-Z]+\.\s?)+)  # Followed by the same thing at least once more
+                    (?:\s|\b|$))
+                    """, re.VERBOSE)
+r_caps_skip = re.compile("<(/)?(?:pre|code|kbd|script|math)[^>]*>", re.IGNORECASE)
+
+r_suffix = re.compile(r'(?P<number>[\d]+)(?P<ord>st|nd|rd|th)')
+
+r_quotes = re.compile(r"""((<(p|h[1-6]|li|dt|dd)[^>]*>|^)              # start with an opening p, h1-6, li, dd, dt or the start of the string
+                          \s*                                          # optional white space!
+                          (<(a|em|span|strong|i|b)[^>]*>\s*)*)         # optional opening inline tags, with more optional white space for each.
+                          (("|&ldquo;|&\#8220;)|('|&lsquo;|&\#8216;))  # Find me a quote! (only need to find the left quotes and the primes)
+                                                                       # double quotes are in group 7, singles in group 8
+                          """, re.VERBOSE)
+
+r_widont = re.compile(r"""((?:</?(?:a|em|span|strong|i|b)[^>]*>)|[^<>\s]) # must be proceeded by an approved inline opening or closing tag or a nontag/nonspace
+                          \s+                                             # the space to replace
+                          ([^<>\s]+                                       # must be flollowed by non-tag non-space characters
+                          \s*                                             # optional white space!
+                          (</(a|em|span|strong|i|b)>\s*)*                 # optional closing inline tags with optional white space after each
+                          ((</(p|h[1-6]|li|dt|dd)>)|$))                   # end with a closing p, h1-6, li or the end of the string
+                          """, re.VERBOSE)
+
+# the parts of the patterns above that match a single token
+r_block = re.compile(r'<(p|h[1-6]|li|dt|dd)[^>]*>')
+r_block_end = re.compile(r'</(p|h[1-6]|li|dt|dd)>\Z')
+r_inline = re.compile(r'<(a|em|span|strong|i|b)[^>]*>')
+r_inline_any = re.compile(r'</?(?:a|em|span|strong|i|b)[^>]*>')
+r_inline_end = re.compile(r'</(a|em|span|strong|i|b)>\Z')
+r_quote = re.compile(r"""(\s*(?:<(?:a|em|span|strong|i|b)[^>]*>\s*)*)
+                         (("|&ldquo;|&\#8220;)|('|&lsquo;|&\#8216;))""", re.VERBOSE)
+r_quote_pending = re.compile(r'\s*(?:<(?:a|em|span|strong|i|b)[^>]*>\s*)*\Z')
+r_space = re.compile(r'\s*\Z')
+r_white = re.compile(r'\s')
+r_nonspace = re.compile(r'\S')
+r_split = re.compile(r'(<[^>]*>)')
+
 
 class Typography(Filter):
 
@@ -35,31 +91,26 @@ class Typography(Filter):
         self.mode = conf.get("typography_mode", "2")  # -- en-dash, --- em-dash
         self.default = ['amp', 'widont', 'smartypants', 'caps']
 
-        if self.mode == "a":
-            smartypants.educateDashes = new_dashes
-            smartypants.educateDashesOldSchool = new_dashes
-
-            self.mode = "2"
-
         self.ignore = env.options.ignore
-        self.filters = {'amp': amp, 'widont': widont, 'caps': caps,
-                        'initial_quotes': initial_quotes, 'number_suffix': number_suffix,
-                        'typo': typogrify, 'typogrify': typogrify, 'all': typogrify,
-                        'smartypants': smartypants.smartyPants}
+        self.typesetters = {}
 
-    def transform(self, content, entry, *args):
+    def typesetter(self, args):
+
+        try:
+            return self.typesetters[args]
+        except KeyError:
+            pass
 
         if any(filter(lambda k: k in args, ['all', 'typo', 'typogrify'])):
-            return typogrify(content)
+            rv = Typesetter(FILTERS, 'a' if self.mode == 'a' else '2')
+        else:
+            rv = Typesetter(self.default + list(args), self.mode)
 
-        for x in ['amp', 'widont', 'smartypants', 'caps', 'initial_quotes', 'number_suffix']:
-            if x in self.default + list(args):
-                if x == 'smartypants':
-                    content = self.filters[x](content, self.mode)
-                else:
-                    content = self.filters[x](content)
+        self.typesetters[args] = rv
+        return rv
 
-        return content
+    def transform(self, content, entry, *args):
+        return self.typesetter(args)(content)
 
 
 def new_dashes(str):
@@ -69,6 +120,260 @@ def new_dashes(str):
     return str
 
 
+def stupefy(text):
+    try:
+        return smartypants.stupefyEntities(text)
+    except AttributeError:
+        return smartypants.convert_entities(text, 2)
+
+
+def educator(*names):
+    """Return the first SmartyPants function available, the names changed
+    with SmartyPants 2.0."""
+
+    for name in names:
+        try:
+            return getattr(smartypants, name)
+        except AttributeError:
+            pass
+
+
+class Typesetter(object):
+    """Apply `filters` (in the order of :data:`FILTERS`) to HTML, SmartyPants
+    runs with the attributes `mode` or the custom mode "a".
+
+    The text is tokenized once and every text node passes all filters before
+    the next node, :func:`widont` and :func:`initial_quotes` look at the
+    surrounding tags instead of the whole text.  Texts with stray ``<`` or
+    ampersands :func:`amp` sees in a different context are transformed by
+    one filter after another, the output is the same in both cases."""
+
+    def __init__(self, filters, mode='2'):
+
+        self.filters = set(filters)
+        self.functions = {'amp': amp, 'widont': widont, 'caps': caps,
+                          'initial_quotes': initial_quotes, 'number_suffix': number_suffix,
+                          'smartypants': self.smartypants}
+
+        if mode == '0':
+            self.filters.discard('smartypants')
+
+        try:
+            self.skip = smartypants._tags_to_skip_regex()
+        except AttributeError:
+            self.skip = smartypants.tags_to_skip_regex
+
+        dashes = {
+            '1': educator('educateDashes', 'convert_dashes'),
+            '2': educator('educateDashesOldSchool', 'convert_dashes_oldschool'),
+            '3': educator('educateDashesOldSchoolInverted', 'convert_dashes_oldschool_inverted')
+        }
+
+        if mode == 'a':
+            dashes['1'] = dashes['2'] = new_dashes
+            mode = '2'
+
+        flags = {'1': 'qbde', '2': 'qbDe', '3': 'qbie', '-1': 's'}.get(mode, mode)
+
+        # (substrings required to modify the text, function) in SmartyPants' order
+        self.educators = [(('\\', ), educator('processEscapes', 'process_escapes'))]
+
+        # SmartyPants 1.x converts &quot; regardless of "w"
+        if 'w' in flags or educator('educateQuotes'):
+            self.educators.append((('&quot;', ), lambda t: re.sub('&quot;', '"', t)))
+
+        for c, key in ('d', '1'), ('D', '2'), ('i', '3'):
+            if c in flags:
+                self.educators.append((('--', ), dashes[key]))
+                break
+
+        if 'e' in flags:
+            self.educators.append((('...', '. . .'), educator('educateEllipses', 'convert_ellipses')))
+
+        if 'b' in flags or 'B' in flags:
+            self.educators.append((('``', "''"), educator('educateBackticks', 'convert_backticks')))
+
+        if 'B' in flags:
+            self.educators.append((('`', "'"), educator('educateSingleBackticks', 'convert_single_backticks')))
+
+        self.quotes = 'q' in flags
+        self.educate_quotes = educator('educateQuotes', 'convert_quotes')
+        self.stupefy = 's' in flags
+
+    def __call__(self, text):
+
+        tokens = self.tokenize(text)
+        if tokens is None:
+            for name in FILTERS:
+                if name in self.filters:
+                    text = self.functions[name](text)
+            return text
+
+        if 'widont' in self.filters:
+            self.widont(tokens)
+
+        return ''.join(self.process(tokens, self.filters))
+
+    def tokenize(self, text):
+        """Tokenize `text` and wrap ampersands, return None if the filters
+        would disagree on the tokens."""
+
+        tokens = smartypants._tokenize(text)
+        if text.count('<') != sum(1 for token in tokens if token[0] == 'tag'):
+            return None
+
+        if 'amp' not in self.filters or not r_amp.search(text):
+            return tokens
+
+        rv, pos = [], 0
+        for token in tokens:
+            kind, value = token
+
+            if kind == 'tag':
+                match = r_tag.match(text, pos)
+                if match is None and r_amp.search(value):
+                    return None
+                if match is not None and match.end() != pos + len(value):
+                    return None
+                rv.append(token)
+            elif '&' in value:
+                parts = r_split.split(amp(value))
+                for i, part in enumerate(parts):
+                    if part:
+                        rv.append(['tag' if i % 2 else 'text', part])
+            else:
+                rv.append(token)
+
+            pos += len(value)
+
+        return rv
+
+    def widont(self, tokens):
+        """Replace the space before the last word in front of each closing
+        block tag (and at the end) with ``&nbsp;``, see :func:`widont`."""
+
+        anchors = [i for i, (kind, value) in enumerate(tokens)
+                   if kind == 'tag' and r_block_end.match(value)]
+
+        for k in anchors + [len(tokens)]:
+            j = k - 1
+            while j >= 0:
+                kind, value = tokens[j]
+                if kind == 'tag' and not r_inline_end.match(value):
+                    break
+                if kind == 'text' and not r_space.match(value):
+                    break
+                j -= 1
+
+            if j < 0 or tokens[j][0] == 'tag':
+                continue
+
+            value = tokens[j][1]
+            white = lambda i: r_white.match(value, i) is not None
+
+            end = len(value)
+            while end > 0 and white(end - 1):
+                end -= 1
+
+            start = end
+            while start > 0 and value[start - 1] not in '<>' and not white(start - 1):
+                start -= 1
+
+            space = start
+            while space > 0 and white(space - 1):
+                space -= 1
+
+            if start == end or space == start:
+                continue
+
+            if space > 0:
+                if value[space - 1] in '<>':
+                    continue
+            elif j == 0 or not r_inline_any.match(tokens[j - 1][1]):
+                continue
+
+            tokens[j][1] = value[:space] + '&nbsp;' + value[start:]
+
+    def educate(self, text, prev):
+        """Educate a single text token the way SmartyPants does, `prev` is
+        the last character of the previous text token."""
+
+        for needles, func in self.educators:
+            for needle in needles:
+                if needle in text:
+                    text = func(text)
+                    break
+
+        if self.quotes:
+            if text == "'":
+                text = "&#8217;" if r_nonspace.match(prev) else "&#8216;"
+            elif text == '"':
+                text = "&#8221;" if r_nonspace.match(prev) else "&#8220;"
+            elif "'" in text or '"' in text:
+                text = self.educate_quotes(text)
+
+        if self.stupefy and '&#8' in text:
+            text = stupefy(text)
+
+        return text
+
+    def smartypants(self, text):
+        return ''.join(self.process(smartypants._tokenize(text), ['smartypants']))
+
+    def process(self, tokens, filters):
+
+        smarty, capitalize = 'smartypants' in filters, 'caps' in filters
+        quotes, suffix = 'initial_quotes' in filters, 'number_suffix' in filters
+
+        stack, prev, skipped = [], '', False
+        start = True  # at the beginning or after an opening block tag
+
+        for kind, value in tokens:
+            if kind == 'tag':
+                if smarty:
+                    match = self.skip.match(value)
+                    if match and not match.group(1):
+                        stack.append(match.group(2).lower())
+                    elif match and stack and match.group(2).lower() == stack[-1]:
+                        stack.pop()
+
+                if capitalize:
+                    match = r_caps_skip.match(value)
+                    skipped = match is not None and match.group(1) is None
+
+                if quotes:
+                    if r_block.match(value):
+                        start = True
+                    elif start and not r_inline.match(value):
+                        start = False
+
+                if suffix:
+                    value = r_suffix.sub(_suffix_process, value)
+
+                yield value
+                continue
+
+            if smarty:
+                if not stack:
+                    value, prev = self.educate(value, prev), value[-1:]
+                else:
+                    prev = value[-1:]
+
+            if capitalize and not skipped:
+                value = r_caps.sub(_cap_wrapper, value)
+
+            if quotes and start:
+                match = r_quote.match(value)
+                if match:
+                    value = _quote_wrapper(*match.group(1, 3, 4)) + value[match.end():]
+                start = match is None and r_quote_pending.match(value) is not None
+
+            if suffix:
+                value = r_suffix.sub(_suffix_process, value)
+
+            yield value
+
+
 def amp(text, autoescape=None):
     """Wraps apersands in HTML with ``<span class="amp">`` so they can be
     styled with CSS. Apersands are also normalized to ``&amp;``. Requires
@@ -96,18 +401,12 @@ def amp(text, autoescape=None):
     u'<link href="xyz.html" title="One & Two">xyz</link>'
     """
 
-    # tag_pattern from http://haacked.com/archive/2004/10/25/usingregularexpressionstomatchhtml.aspx
-    # it kinda sucks but it fixes the standalone amps in attributes bug
-    tag_pattern = '</?\w+((\s+\w+(\s*=\s*(?:".*?"|\'.*?\'|[^\'">\s]+))?)+\s*|\s*)/?>'
-    amp_finder = re.compile(r"(\s|&nbsp;)(&|&amp;|&\#38;)(\s|&nbsp;)")
-    intra_tag_finder = re.compile(r'(?P<prefix>(%s)?)(?P<text>([^<]*))(?P<suffix>(%s)?)' % (tag_pattern, tag_pattern))
-
     def _amp_process(groups):
         prefix = groups.group('prefix') or ''
-        text = amp_finder.sub(r"""\1<span class="amp">&amp;</span>\3""", groups.group('text'))
+        text = r_amp.sub(r"""\1<span class="amp">&amp;</span>\3""", groups.group('text'))
         suffix = groups.group('suffix') or ''
         return prefix + text + suffix
-    return intra_tag_finder.sub(_amp_process, text)
+    return r_intra_tag.sub(_amp_process, text)
 
 
 def caps(text):
@@ -140,35 +439,11 @@ def caps(text):
     result = []
     in_skipped_tag = False
 
-    cap_finder = re.compile(r"""(
-                            (\b[A-Z\d]*        # Group 2: Any amount of caps and digits
-                            [A-Z]\d*[A-Z]      # A cap string must at least include two caps (but they can have digits between them)
-                            [A-Z\d']*\b)       # Any amount of caps and digits or dumb apostsrophes
-                            | (\b[A-Z]+\.\s?   # OR: Group 3: Some caps, followed by a '.' and an optional space
-                            (?:[A-Z]+\.\s?)+)  # Followed by the same thing at least once more
-                            (?:\s|\b|$))
-                            """, re.VERBOSE)
-
-    def _cap_wrapper(matchobj):
-        """This is necessary to keep dotted cap strings to pick up extra spaces"""
-        if matchobj.group(2):
-            return """<span class="caps">%s</span>""" % matchobj.group(2)
-        else:
-            if matchobj.group(3)[-1] == " ":
-                caps = matchobj.group(3)[:-1]
-                tail = ' '
-            else:
-                caps = matchobj.group(3)
-                tail = ''
-            return """<span class="caps">%s</span>%s""" % (caps, tail)
-
-    tags_to_skip_regex = re.compile("<(/)?(?:pre|code|kbd|script|math)[^>]*>", re.IGNORECASE)
-
     for token in tokens:
         if token[0] == "tag":
             # Don't mess with tags.
             result.append(token[1])
-            close_match = tags_to_skip_regex.match(token[1])
+            close_match = r_caps_skip.match(token[1])
             if close_match and close_match.group(1) == None:
                 in_skipped_tag = True
             else:
@@ -177,10 +452,24 @@ def caps(text):
             if in_skipped_tag:
                 result.append(token[1])
             else:
-                result.append(cap_finder.sub(_cap_wrapper, token[1]))
+                result.append(r_caps.sub(_cap_wrapper, token[1]))
     return "".join(result)
 
 
+def _cap_wrapper(matchobj):
+    """This is necessary to keep dotted cap strings to pick up extra spaces"""
+    if matchobj.group(2):
+        return """<span class="caps">%s</span>""" % matchobj.group(2)
+    else:
+        if matchobj.group(3)[-1] == " ":
+            caps = matchobj.group(3)[:-1]
+            tail = ' '
+        else:
+            caps = matchobj.group(3)
+            tail = ''
+        return """<span class="caps">%s</span>%s""" % (caps, tail)
+
+
 def number_suffix(text):
     """Wraps date suffix in <span class="ord">
     so they can be styled with CSS.
@@ -192,14 +481,14 @@ def number_suffix(text):
 
     """
 
-    suffix_finder = re.compile(r'(?P<number>[\d]+)(?P<ord>st|nd|rd|th)')
+    return r_suffix.sub(_suffix_process, text)
 
-    def _suffix_process(groups):
-        number = groups.group('number')
-        suffix = groups.group('ord')
 
-        return "%s<span class='ord'>%s</span>" % (number, suffix)
-    return suffix_finder.sub(_suffix_process, text)
+def _suffix_process(groups):
+    number = groups.group('number')
+    suffix = groups.group('ord')
+
+    return "%s<span class='ord'>%s</span>" % (number, suffix)
 
 
 def initial_quotes(text):
@@ -219,23 +508,17 @@ def initial_quotes(text):
     u'<span class="dquo">&#8220;</span>With smartypanted quotes&#8221;'
     """
 
-    quote_finder = re.compile(r"""((<(p|h[1-6]|li|dt|dd)[^>]*>|^)              # start with an opening p, h1-6, li, dd, dt or the start of the string
-                                  \s*                                          # optional white space!
-                                  (<(a|em|span|strong|i|b)[^>]*>\s*)*)         # optional opening inline tags, with more optional white space for each.
-                                  (("|&ldquo;|&\#8220;)|('|&lsquo;|&\#8216;))  # Find me a quote! (only need to find the left quotes and the primes)
-                                                                               # double quotes are in group 7, singles in group 8
-                                  """, re.VERBOSE)
-
-    def _quote_wrapper(matchobj):
-        if matchobj.group(7):
-            classname = "dquo"
-            quote = matchobj.group(7)
-        else:
-            classname = "quo"
-            quote = matchobj.group(8)
-        return """%s<span class="%s">%s</span>""" % (matchobj.group(1), classname, quote)
-    output = quote_finder.sub(_quote_wrapper, text)
-    return output
+    return r_quotes.sub(lambda m: _quote_wrapper(m.group(1), m.group(7), m.group(8)), text)
+
+
+def _quote_wrapper(prefix, double, single):
+    if double:
+        classname = "dquo"
+        quote = double
+    else:
+        classname = "quo"
+        quote = single
+    return """%s<span class="%s">%s</span>""" % (prefix, classname, quote)
 
 
 def widont(text):
@@ -279,16 +562,7 @@ def widont(text):
     u'<div><p>But divs with paragraphs&nbsp;do!</p></div>'
     """
 
-    widont_finder = re.compile(r"""((?:</?(?:a|em|span|strong|i|b)[^>]*>)|[^<>\s]) # must be proceeded by an approved inline opening or closing tag or a nontag/nonspace
-                                   \s+                                             # the space to replace
-                                   ([^<>\s]+                                       # must be flollowed by non-tag non-space characters
-                                   \s*                                             # optional white space!
-                                   (</(a|em|span|strong|i|b)>\s*)*                 # optional closing inline tags with optional white space after each
-                                   ((</(p|h[1-6]|li|dt|dd)>)|$))                   # end with a closing p, h1-6, li or the end of the string
-                                   """, re.VERBOSE)
-
-    output = widont_finder.sub(r'\1&nbsp;\2', text)
-    return output
+    return r_widont.sub(r'\1&nbsp;\2', text)
 
 
 def typogrify(content):
@@ -296,9 +570,4 @@ def typogrify(content):
 
     Applies the following filters: widont, smartypants, caps, amp, initial_quotes"""
 
-    return number_suffix(
-           initial_quotes(
-           caps(
-           smartypants.smartyPants(
-           widont(
-           amp(content)), "2"))))
+    return Typesetter(FILTERS)(content)
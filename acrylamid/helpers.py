@@ -13,6 +13,7 @@ import imp
 import shutil
 import itertools
 import contextlib
+import threading
 import subprocess
 
 from unicodedata import normalize
@@ -166,8 +167,8 @@ def safeslug(slug):
     return u'-'.join(result)
 
 
-def paginate(lst, ipp, salt="", orphans=0):
-    """paginate(lst, ipp, func=lambda x: x, salt=None, orphans=0)
+def paginate(lst, ipp, salt="", orphans=0, reverse=False):
+    """paginate(lst, ipp, func=lambda x: x, salt=None, orphans=0, reverse=False)
 
     Yields a triple ((next, current, previous), list of entries, has
     changed) of a paginated entrylist. It will first filter by the specified
@@ -178,12 +179,30 @@ def paginate(lst, ipp, salt="", orphans=0):
     :param ipp: items per page
     :param salt: uses as additional identifier in memoize
     :param orphans: avoid N orphans on last page
+    :param reverse: number pages from the oldest entry, see below
 
     >>> for x, values, _, paginate(entryrange(20), 6, orphans=2):
     ...    print(x, values)
     (None, 0, 1), [entries 1..6]
     (0, 1, 2), [entries 7..12]
-    (1, 2, None), [entries 12..20]"""
+    (1, 2, None), [entries 12..20]
+
+    A new entry shifts all entries by one and thus modifies every page. With
+    `reverse` the pages are sliced from the end of the list and numbered
+    from the oldest page, the first page yielded is the newest (and
+    possibly incomplete) page with the highest number.  A new entry only
+    modifies the newest page and -- if it overflows -- the page before.
+
+    >>> for x, values, _, paginate(entryrange(20), 6, orphans=2, reverse=True):
+    ...    print(x, values)
+    (None, 3, 2), [entries 1..8]
+    (3, 2, 1), [entries 9..14]
+    (2, 1, None), [entries 15..20]"""
+
+    if reverse:
+        for rv in _rpaginate(lst, ipp, salt, orphans):
+            yield rv
+        return
 
     # detect removed or newly added entries
     modified = cache.memoize('paginate-' + salt, hash(*lst))
@@ -206,6 +225,31 @@ def paginate(lst, ipp, salt="", orphans=0):
         yield (next, curr, prev), entries, modified or any(e.modified for e in entries)
 
 
+def _rpaginate(lst, ipp, salt, orphans):
+
+    # slice from the oldest entry, the newest page absorbs the orphans
+    res = list(batch(lst[::-1], ipp))
+
+    if len(res) >= 2 and len(res[-1]) <= orphans:
+        res[-2].extend(res[-1])
+        res.pop(-1)
+
+    j = len(res)
+    for i in range(j, 0, -1):
+
+        next = None if i == j else i+1
+        curr = i
+        prev = None if i == 1 else i-1
+
+        entries = res[i-1][::-1]
+
+        # a page has changed if its entries or its neighbors have changed
+        key = 'paginate-' + salt if i == j else 'paginate-%s-%i' % (salt, i)
+        modified = cache.memoize(key, hash('%s-%s-%s' % (next, curr, prev), *entries))
+
+        yield (next, curr, prev), entries, modified or any(e.modified for e in entries)
+
+
 def safe(string):
     """Safe string to fit in to the YAML standard (hopefully). Counterpart
     to :func:`acrylamid.readers.unsafe`."""
@@ -307,10 +351,11 @@ class metaevent(type):
             name = func.func_name if compat.PY2K else func.__name__
 
             def dec(cls, ns, path, *args, **kwargs):
-                for callback in  cls.callbacks[name]:
-                    callback(ns, path)
-                if name in cls.events:
-                    attrs['counter'][name] += 1
+                with cls.lock:
+                    for callback in  cls.callbacks[name]:
+                        callback(ns, path)
+                    if name in cls.events:
+                        attrs['counter'][name] += 1
                 return func(cls, path, *args, **kwargs)
             dec.__doc__ = func.__doc__  # sphinx
             return dec
@@ -356,6 +401,10 @@ class event(compat.metaclass(metaevent, object)):
 
         event.register(callback, to=['create'])
 
+    Callbacks and counters are guarded by a lock, because views may run in
+    parallel threads. A callback therefore never runs concurrently to another
+    callback.
+
     .. Note:: This class is a singleton and should not be initialized
 
     .. method:: count(event)
@@ -368,6 +417,7 @@ class event(compat.metaclass(metaevent, object)):
 
     callbacks = defaultdict(list)
     counter = defaultdict(int)
+    lock = threading.RLock()
 
     def __init__(self):
         raise TypeError("You can't construct event.")
@@ -380,8 +430,9 @@ class event(compat.metaclass(metaevent, object)):
         :param callback: a function
         :param to: a list of events when your function gets called"""
 
-        for item in to:
-            event.callbacks[item].append(callback)
+        with event.lock:
+            for item in to:
+                event.callbacks[item].append(callback)
 
     def count(self, event):
         return self.counter.get(event, 0)
@@ -390,6 +441,11 @@ class event(compat.metaclass(metaevent, object)):
         for key in self.counter:
             self.counter[key] = 0
 
+    def clear(self):
+        """Remove all registered callbacks."""
+        with event.lock:
+            event.callbacks.clear()
+
     def create(self, path, ctime=None):
         if ctime:
             log.info("create  [%.2fs] %s", ctime, path)
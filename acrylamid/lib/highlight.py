@@ -0,0 +1,50 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright 2012 Martin Zimmermann <info@posativ.org>. All rights reserved.
+# License: BSD Style, 2 clauses -- see LICENSE.
+
+"""
+Cached syntax highlighting
+~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Pygments is slow, but code blocks rarely change when the surrounding post
+does.  The functions below store highlighted code in the cache, keyed by
+lexer, formatter options and the code itself, so editing the prose of a post
+re-uses its highlighted code blocks.
+
+Markdown's `codehilite` extension (see :mod:`acrylamid.filters.md`) and the
+reStructuredText code directives (see :mod:`acrylamid.filters.rstx_sourcecode`)
+use this module instead of calling Pygments directly."""
+
+import hashlib
+
+from acrylamid.core import cache
+
+
+def fetch(key, func):
+    """Return the cached value for `key` or compute it with `func`.  Each
+    value is a cache object of its own (named ``highlight-`` + digest), hence
+    it is evicted independently from any entry."""
+
+    if cache.backend is None:
+        return func()
+
+    path = 'highlight-' + hashlib.md5(repr(key).encode('utf-8')).hexdigest()
+    rv = cache.get(path, 'value')
+    if rv is None:
+        rv = cache.set(path, 'value', func())
+    return rv
+
+
+def highlight(code, lexer, formatter, outfile=None):
+    """Drop-in for :func:`pygments.highlight`."""
+
+    import pygments
+
+    if outfile is not None:
+        return pygments.highlight(code, lexer, formatter, outfile)
+
+    key = ('pygments', pygments.__version__,
+           lexer.__class__.__module__, lexer.__class__.__name__, sorted(lexer.options.items()),
+           formatter.__class__.__name__, sorted(formatter.options.items()), code)
+    return fetch(key, lambda: pygments.highlight(code, lexer, formatter))
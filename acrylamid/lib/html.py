@@ -15,7 +15,15 @@ add custom behavior.
 This implementation is used :mod:`acrylamid.filters.acronyms`,
 :mod:`acrylamid.filters.hyphenation` and more advanced in
 :mod:`acrylamid.filters.summarize`. It is quite fast, but remains
-an unintuitive way of working with HTML."""
+an unintuitive way of working with HTML.
+
+Several of these filters usually run one after another. Instead of parsing
+and serializing the HTML for each filter, the HTML can be parsed once into
+:class:`Events` that are passed from parser to parser (see
+:func:`acrylamid.filters.chain`) and serialized at the end.
+
+Well-formed HTML is tokenized by :func:`scan` instead of the stdlib parser,
+see ``misc/benchmark_html.py`` to compare both on your blog."""
 
 import sys
 import re
@@ -26,6 +34,12 @@ from acrylamid.compat import PY2K, unichr
 from html.parser import HTMLParser as DefaultParser
 from html.entities import name2codepoint
 
+# text is unescaped by the parser itself (Python 3.5+)
+if getattr(DefaultParser(), 'convert_charrefs', False):
+    from html import unescape as charrefs
+else:
+    charrefs = None
+
 
 def unescape(s):
     """&amp; -> & conversion"""
@@ -33,15 +47,115 @@ def unescape(s):
             lambda m: unichr(name2codepoint[m.group(1)]), s)
 
 
+def tokenize(html):
+    """Parse `html` into a list of :class:`Events`."""
+    return HTMLParser(html, stream=True).result
+
+
+def scan(html):
+    """Tokenize `html` into a list of ``(event, args)`` tuples -- the same
+    handler calls the stdlib parser makes -- using a few regular expressions.
+    Only well-formed HTML (as generated by our markup filters) is supported,
+    for anything else (a stray ``<``, a CDATA section, an unclosed ``<script>``
+    and so on) this function returns None."""
+
+    rv = list(_scan(html))
+    if rv and rv[-1][0] is None:
+        return None
+    return rv
+
+
+def _scan(html):
+    """Generator behind :func:`scan`.  Instead of returning None it yields
+    ``(None, (pos, ))`` and stops, the stdlib parser continues at `pos` (the
+    end of the last well-formed token) as if it had parsed everything."""
+
+    i, n = 0, len(html)
+
+    while i < n:
+        m = _token.match(html, i)
+        if m is None:
+            yield None, (i, )
+            return
+
+        text, tag, attrs, close, end, comment, decl, pi = m.groups()
+        i = m.end()
+
+        if text is not None:
+            if i == n:
+                # the stdlib parser waits for more text, see HTMLParser.goahead
+                amppos = html.rfind('&', max(m.start(), n - 34))
+                if amppos >= 0 and not re.compile(r'[\s;]').search(html, amppos):
+                    yield None, (m.start(), )
+                    return
+            yield 'data', (charrefs(text), )
+        elif tag is not None:
+            attrs = [(key.lower(), _value(value)) for key, value in _attr.findall(attrs)]
+            tag = tag.lower()
+
+            if close:
+                yield 'startendtag', (tag, attrs)
+                continue
+
+            if tag in HTMLParser.CDATA_CONTENT_ELEMENTS:
+                e = re.compile(r'</\s*%s\s*>' % tag, re.I).search(html, i)
+                if e is None:
+                    yield None, (m.start(), )
+                    return
+
+                yield 'starttag', (tag, attrs)
+                if e.start() > i:
+                    yield 'data', (html[i:e.start()], )
+                yield 'endtag', (tag, )
+                i = e.end()
+            else:
+                yield 'starttag', (tag, attrs)
+        elif end is not None:
+            yield 'endtag', (end.lower(), )
+        elif comment is not None:
+            yield 'comment', (comment, )
+        elif decl is not None:
+            yield 'decl', (decl, )
+        else:
+            yield 'pi', (pi, )
+
+
+def _value(value):
+    """Attribute value as returned by the stdlib parser."""
+
+    if not value:
+        return None
+    if value[0] in ('"', "'"):
+        value = value[1:-1]
+    return charrefs(value) if value else value
+
+
+_token = re.compile(r'''
+    ([^<]+)
+  | <([a-zA-Z][-.a-zA-Z0-9:_]*)((?:\s+[a-zA-Z_:][-.a-zA-Z0-9_:]*
+        (?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s"'=<>`]+))?)*)\s*(/?)>
+  | </([a-zA-Z][-.a-zA-Z0-9:_]*)\s*>
+  | <!--(.*?)--\s*>
+  | <!([dD][oO][cC][tT][yY][pP][eE][^>]*)>
+  | <\?([^>]*)>''', re.X | re.S)
+
+_attr = re.compile(r'''\s+([a-zA-Z_:][-.a-zA-Z0-9_:]*)
+    (?:\s*=\s*("[^"]*"|'[^']*'|[^\s"'=<>`]+))?''', re.X)
+
+
 def format(attrs):
     res = []
     for key, value in attrs:
         if value is None:
             res.append(key)
+        elif _special.search(value) is None:
+            res.append('%s="%s"' % (key, value))
         else:
             res.append('%s="%s"' % (key, escape(value, quote=True)))
     return ' '.join(res)
 
+_special = re.compile('[&<>"]')
+
 
 if sys.version_info < (3, 0):
     class WTFMixin(object, DefaultParser):
@@ -51,6 +165,99 @@ else:
         pass
 
 
+class StopParsing(Exception):
+    """Raised by a handler of :class:`HTMLParser` to skip the remaining
+    HTML, :attr:`HTMLParser.result` is the result so far."""
+
+
+class Events(list):
+    """A list of parser events, each a tuple of the event type, the HTML
+    it represents and the arguments for the handler, e.g. ``('starttag',
+    '<a href="/">', 'a', [('href', '/')])``.
+
+    Strings appended to this list are parsed into events, just like the
+    next parser would do with the serialized HTML, but serialize unchanged.
+    Plain text and simple end tags skip the parser."""
+
+    cdata = None
+    source = None
+
+    @classmethod
+    def fromstring(cls, html):
+        """Events of `html` that is parsed by the first parser it is passed
+        to (hence no extra pass over the events)."""
+
+        rv = cls()
+        rv.source = html
+        return rv
+
+    def append(self, item):
+
+        if item.__class__ is not tuple:
+            item = self.parse(item)
+            if item is None:
+                return
+
+        if item[0] == 'starttag':
+            if item[2] in HTMLParser.CDATA_CONTENT_ELEMENTS:
+                self.cdata = item[2]
+        elif item[0] == 'endtag':
+            if item[2] == self.cdata:
+                self.cdata = None
+        elif item[0] == 'raw':
+            self.cdata = item[2].cdata
+
+        list.append(self, item)
+
+    def parse(self, html):
+        """Parse `html` into a single event."""
+
+        if not html:
+            return None
+
+        m = Events.endtag.match(html)
+        if m and (self.cdata is None or m.group(1).lower() == self.cdata):
+            return ('endtag', html, m.group(1).lower())
+
+        if self.cdata or '<' not in html and '&' not in html:
+            return ('data', html, html)
+
+        if '<' not in html and charrefs is not None:
+            data = charrefs(html)
+            return ('raw', html, Events([('data', data, data)]))
+
+        parser = HTMLParser(html, stream=True)
+        parser.close()
+        return ('raw', html, parser.result)
+
+    def replay(self, parser, data=None):
+        """Call the handler of `parser` for each event.  Adjacent text is
+        passed as a single data event as the parser would do."""
+
+        flush, data = data is None, [] if data is None else data
+
+        for event in self:
+            if event[0] == 'data':
+                data.append(event[2])
+            elif event[0] == 'raw':
+                event[2].replay(parser, data)
+            else:
+                if data:
+                    parser.handle_data(''.join(data))
+                    del data[:]
+                getattr(parser, 'handle_' + event[0])(*event[2:])
+
+        if flush and data:
+            parser.handle_data(''.join(data))
+
+    def serialize(self):
+        if self.source is not None:
+            return self.source
+        return ''.join(event[1] for event in self)
+
+Events.endtag = re.compile(r'</([a-zA-Z][-.a-zA-Z0-9:_]*)>$')
+
+
 class HTMLParser(WTFMixin):
     """A more useful base HTMLParser that returns the actual HTML by
     default::
@@ -60,28 +267,94 @@ class HTMLParser(WTFMixin):
     It is intended to use this class as base so you don't make
     the same mistakes I did before.
 
+    Instead of a string you can also pass :class:`Events` (or set `stream`
+    to parse a string into events), then :attr:`result` is a list of events
+    as well and the parser can be chained with other parsers without
+    re-parsing the HTML.
+
     .. attribute:: result
 
-        This is the processed HTML."""
+        This is the processed HTML.
+
+    .. attribute:: output
+
+        The processed HTML as string or :class:`Events` if the input
+        was a stream.
+
+    .. attribute:: fast
 
-    def __init__(self, html):
+        Tokenize with :func:`scan` instead of the (slow) stdlib parser if
+        possible, enabled if the stdlib parser converts character references
+        itself (Python 3.5 and later).  Note, that :meth:`getpos` is not
+        available then.
+
+    A handler may raise :class:`StopParsing` if the remaining HTML would not
+    change the result anymore, e.g. the summary is complete."""
+
+    fast = charrefs is not None
+
+    def __init__(self, html, stream=False):
         DefaultParser.__init__(self)
-        self.result = []
         self.stack = []
+        self.stream = stream
+
+        try:
+            if isinstance(html, Events) and html.source is None:
+                self.result = Events()
+                html.replay(self)
+            elif isinstance(html, Events):
+                self.result = Events()
+                self.feed(html.source)
+            else:
+                self.result = Events() if stream else []
+                self.feed(html)
+        except StopParsing:
+            pass
+
+    def feed(self, data):
+
+        if not self.fast or self.rawdata:
+            return DefaultParser.feed(self, data)
 
-        self.feed(html)
+        # tokens are dispatched as they are scanned, so a handler that raises
+        # StopParsing also stops the tokenizer
+        handlers = dict((event, getattr(self, 'handle_' + event)) for event in
+                        ('starttag', 'startendtag', 'endtag', 'data', 'comment', 'decl', 'pi'))
+        for event, args in _scan(data):
+            if event is None:
+                return DefaultParser.feed(self, data[args[0]:])
+            handlers[event](*args)
+
+    @property
+    def output(self):
+        if isinstance(self.result, Events):
+            return self.result
+        return ''.join(self.result)
+
+    def write(self, event):
+        """Append the HTML of `event` to result or the event itself if it is
+        a stream.  Text that contains markup (e.g. from unescaped entities)
+        is appended as HTML, the next parser would see it that way, too."""
+
+        if self.result.__class__ is not Events:
+            self.result.append(event[1])
+        elif event[0] != 'data' or self.stream or '<' not in event[1] and '&' not in event[1]:
+            self.result.append(event)
+        else:
+            self.result.append(event[1])
 
     def handle_starttag(self, tag, attrs):
         """Append tag to stack and write it to result."""
 
         self.stack.append(tag)
-        self.result.append('<%s %s>' % (tag, format(attrs)) if attrs else '<%s>' % tag)
+        self.write(('starttag', '<%s %s>' % (tag, format(attrs)) if attrs else '<%s>' % tag,
+                    tag, attrs))
 
     def handle_data(self, data):
         """Everything that is *not* a tag shows up as data, but you can't expect
        that it is always a continous sentence or word."""
 
-        self.result.append(data)
+        self.write(('data', data, data))
 
     def handle_endtag(self, tag):
         """Append ending tag to result and pop it from the stack too."""
@@ -90,22 +363,22 @@ class HTMLParser(WTFMixin):
             self.stack.pop()
         except IndexError:
             pass
-        self.result.append('</%s>' % tag)
+        self.write(('endtag', '</%s>' % tag, tag))
 
     def handle_startendtag(self, tag, attrs):
         """Something like ``"<br />"``"""
-        self.result.append('<%s %s/>' % (tag, format(attrs)))
+        self.write(('startendtag', '<%s %s/>' % (tag, format(attrs)), tag, attrs))
 
     def handle_entityref(self, name):
         """An escaped ampersand like ``"&#38;"``."""
-        self.result.append('&' + name + ';')
+        self.write(('entityref', '&' + name + ';', name))
 
     def handle_charref(self, char):
         """An escaped umlaut like ``"&auml;"``"""
-        self.result.append('&#' + char + ';')
+        self.write(('charref', '&#' + char + ';', char))
 
     def handle_comment(self, comment):
         """Preserve HTML comments."""
-        self.result.append('<!--' + comment + '-->')
+        self.write(('comment', '<!--' + comment + '-->', comment))
 
-__all__ = ['HTMLParser', 'unescape']
+__all__ = ['HTMLParser', 'Events', 'StopParsing', 'tokenize', 'scan', 'unescape']
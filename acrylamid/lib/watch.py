@@ -0,0 +1,286 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright 2012 Martin Zimmermann <info@posativ.org>. All rights reserved.
+# License: BSD Style, 2 clauses -- see LICENSE.
+
+"""
+File System Watcher
+~~~~~~~~~~~~~~~~~~~
+
+Watch directories for changes and report the changed paths.  On Linux the
+kernel notifies us via inotify, everywhere else we fall back to polling the
+modification time of every file.
+
+Example usage::
+
+    >>> watcher = watch([('content/', ['.*']), ('theme/', [])])
+    >>> watcher.wait(timeout=1.0)
+    set(['content/2013/hello-world.txt'])
+
+:meth:`Watcher.wait` returns an empty set on timeout and ``None`` if the
+changes are unknown, e.g. when the inotify event queue overflowed."""
+
+import os
+import abc
+import sys
+import time
+import errno
+import select
+import struct
+
+from os.path import join, isdir
+
+from acrylamid import log
+from acrylamid.compat import metaclass
+from acrylamid.readers import ignored
+
+try:
+    import ctypes
+    import ctypes.util
+except ImportError:
+    ctypes = None  # NOQA
+
+
+def walk(directory, patterns, top=None):
+    """Like :func:`acrylamid.readers.filelist` but yields directories (with
+    a trailing slash) as well.  Start at `top` if given, a sub-directory of
+    `directory`."""
+
+    for root, dirs, files in os.walk(top or directory):
+        yield root + '/'
+
+        for path in files:
+            if not ignored(root, path, patterns, directory):
+                yield join(root, path)
+
+        for dir in dirs[:]:
+            if ignored(root, dir + '/', patterns, directory):
+                dirs.remove(dir)
+
+
+class Watcher(metaclass(abc.ABCMeta, object)):
+    """Watch a list of `(directory, patterns)` tuples.  Paths matching the
+    ignore `patterns` (see :func:`acrylamid.readers.ignored`) are not
+    reported.  Changes are debounced: :meth:`wait` returns not until no
+    further change occurred within `delay` seconds."""
+
+    def __init__(self, directories, delay=0.1):
+        self.directories = [(d, p) for d, p in directories if d and isdir(d)]
+        self.delay = delay
+
+    @abc.abstractmethod
+    def wait(self, timeout=None):
+        """Block until a change occurred or `timeout` seconds elapsed and
+        return the changed paths, see the module docstring."""
+        return
+
+    def close(self):
+        pass
+
+
+class Polling(Watcher):
+    """Compare the modification time of every file each `interval` seconds."""
+
+    def __init__(self, directories, delay=0.1, interval=1.0):
+        super(Polling, self).__init__(directories, delay)
+        self.interval = interval
+        self.mtimes = self.scan()
+
+    def scan(self):
+        rv = {}
+        for directory, patterns in self.directories:
+            for path in walk(directory, patterns):
+                try:
+                    rv[path] = os.stat(path).st_mtime
+                except OSError:
+                    pass
+        return rv
+
+    def diff(self):
+        mtimes = self.scan()
+        rv = set(path for path in set(mtimes) | set(self.mtimes)
+                 if mtimes.get(path) != self.mtimes.get(path) and not path.endswith('/'))
+        self.mtimes = mtimes
+        return rv
+
+    def wait(self, timeout=None):
+
+        start = time.time()
+        while True:
+            changed = self.diff()
+            if changed:
+                break
+            if timeout is not None and time.time() - start >= timeout:
+                return set()
+            time.sleep(self.interval if timeout is None else
+                       min(self.interval, max(0, timeout - time.time() + start)))
+
+        # debounce, e.g. an editor saving multiple files at once
+        while True:
+            time.sleep(self.delay)
+            more = self.diff()
+            if not more:
+                return changed
+            changed |= more
+
+
+class Inotify(Watcher):
+    """Linux' inotify(7) via ctypes.  Every (not ignored) directory gets its
+    own watch descriptor, new directories are added on the fly."""
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+
+    IN_NONBLOCK = 0x00000800
+    IN_CLOEXEC = 0x00080000
+
+    mask = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+            | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+    libc = None
+
+    @classmethod
+    def available(cls):
+        if cls.libc is None:
+            if ctypes is None or not sys.platform.startswith('linux'):
+                cls.libc = False
+            else:
+                try:
+                    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                                       use_errno=True)
+                    libc.inotify_init1, libc.inotify_add_watch
+                except (OSError, AttributeError):
+                    cls.libc = False
+                else:
+                    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+                    cls.libc = libc
+        return bool(cls.libc)
+
+    def __init__(self, directories, delay=0.1):
+        super(Inotify, self).__init__(directories, delay)
+
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+        # watch descriptor -> (path, (directory, patterns))
+        self.wds = {}
+
+        for directory, patterns in self.directories:
+            for path in walk(directory, patterns):
+                if path.endswith('/'):
+                    self.add(path[:-1], (directory, patterns))
+
+    def add(self, path, source):
+        wd = self.libc.inotify_add_watch(self.fd, path.encode(sys.getfilesystemencoding()), self.mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                log.warn('inotify watch limit reached, see /proc/sys/fs/inotify/max_user_watches')
+            elif err not in (errno.ENOENT, errno.ENOTDIR):
+                log.debug('inotify_add_watch(%s): %s' % (path, os.strerror(err)))
+            return
+        self.wds[wd] = (path, source)
+
+    def read(self):
+        """Read and parse all pending events, returns a set of changed paths
+        or ``None`` if the kernel queue overflowed or a directory vanished."""
+
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return set()
+            raise
+
+        rv, i = set(), 0
+        while i + 16 <= len(buf):
+            wd, mask, cookie, length = struct.unpack_from('iIII', buf, i)
+            name = buf[i + 16:i + 16 + length].rstrip(b'\0').decode(
+                sys.getfilesystemencoding(), 'replace')
+            i += 16 + length
+
+            if mask & self.IN_Q_OVERFLOW:
+                return None
+
+            if mask & self.IN_IGNORED or wd not in self.wds:
+                self.wds.pop(wd, None)
+                continue
+
+            root, (directory, patterns) = self.wds[wd]
+            if not name:
+                continue
+
+            if mask & self.IN_ISDIR:
+                if ignored(root, name + '/', patterns, directory):
+                    continue
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    # files may have been created before the watch existed
+                    for path in walk(directory, patterns, join(root, name)):
+                        if path.endswith('/'):
+                            self.add(path[:-1], (directory, patterns))
+                        else:
+                            rv.add(path)
+                elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                    # we do not know which files the directory contained
+                    return None
+            elif not ignored(root, name, patterns, directory):
+                rv.add(join(root, name))
+
+        return rv
+
+    def poll(self, timeout):
+        try:
+            return bool(select.select([self.fd], [], [], timeout)[0])
+        except (select.error, OSError) as e:
+            if e.args[0] == errno.EINTR:
+                return False
+            raise
+
+    def wait(self, timeout=None):
+
+        changed, start = set(), time.time()
+        while not changed:
+            if not self.poll(None if timeout is None else
+                             max(0, timeout - time.time() + start)):
+                return set()
+            changed = self.read()
+            if changed is None:
+                return None
+
+        # debounce, e.g. an editor saving multiple files at once
+        while self.poll(self.delay):
+            more = self.read()
+            if more is None:
+                return None
+            changed |= more
+
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def watch(directories, delay=0.1, interval=1.0):
+    """Return an :class:`Inotify` watcher if available, otherwise fall back
+    to :class:`Polling` every `interval` seconds."""
+
+    if Inotify.available():
+        try:
+            return Inotify(directories, delay)
+        except OSError as e:
+            log.debug('inotify: %s' % e)
+
+    return Polling(directories, delay, interval)
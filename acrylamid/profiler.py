@@ -0,0 +1,158 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright 2012 Martin Zimmermann <info@posativ.org>. All rights reserved.
+# License: BSD Style, 2 clauses -- see LICENSE.
+#
+# A simple build profiler that records wall time and number of calls.
+
+"""
+Profiler
+~~~~~~~~
+
+Records wall time and call counts of the compilation stages, e.g. each
+filter's :func:`transform`, each view's :func:`generate` and each template's
+:func:`render`.  The profiler is disabled by default and costs next to nothing
+in that state.
+
+.. code-block:: python
+
+    from acrylamid import profiler
+
+    profiler.enable()
+
+    with profiler.timed('readers.load'):
+        readers.load(conf)
+
+    profiler.report()
+
+Timings are inclusive: a view's time contains the time of the filters and
+templates it uses."""
+
+from __future__ import division
+
+import io
+import json
+import time
+import threading
+
+from collections import defaultdict
+
+from acrylamid import log
+from acrylamid.compat import text_type as str
+
+enabled = False
+
+lock = threading.Lock()
+stats = defaultdict(lambda: [0, 0.0])
+
+
+class Timer(object):
+
+    __slots__ = ('key', 'start')
+
+    def __init__(self, key):
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.time()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        record(self.key, time.time() - self.start)
+
+
+class Null(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+null = Null()
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def reset():
+    with lock:
+        stats.clear()
+
+
+def record(key, seconds, calls=1):
+    """Add `seconds` and `calls` to the stats of `key`."""
+
+    with lock:
+        stats[key][0] += calls
+        stats[key][1] += seconds
+
+
+def timed(key):
+    """Return a context manager that records the wall time of its block."""
+
+    return Timer(key) if enabled else null
+
+
+def iterate(key, iterable):
+    """Record the time it takes to produce each item of `iterable`, e.g. a
+    view's :func:`generate`, but not the time spent by the consumer."""
+
+    if not enabled:
+        for item in iterable:
+            yield item
+        return
+
+    iterator, seconds = iter(iterable), 0.0
+    while True:
+        start = time.time()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            record(key, seconds + time.time() - start)
+            return
+        seconds += time.time() - start
+        yield item
+
+
+def collect():
+    """Return and reset the current stats, used to merge the stats of
+    worker processes with :func:`merge`."""
+
+    with lock:
+        rv = dict((key, tuple(value)) for key, value in stats.items())
+        stats.clear()
+    return rv
+
+
+def merge(other):
+    for key, (calls, seconds) in other.items():
+        record(key, seconds, calls)
+
+
+def report():
+    """Print a table of all stats sorted by total time."""
+
+    with lock:
+        items = sorted(stats.items(), key=lambda item: item[1][1], reverse=True)
+
+    if not items:
+        return
+
+    width = max(len(key) for key, value in items)
+    log.info('%s  %7s  %9s  %9s', 'name'.ljust(width), 'calls', 'total', 'per call')
+    for key, (calls, seconds) in items:
+        log.info('%s  %7i  %8.3fs  %8.2fms', key.ljust(width), calls, seconds,
+                 seconds / calls * 1000 if calls else 0.0)
+
+
+def dump(path):
+    """Write all stats as JSON to `path`."""
+
+    with lock:
+        rv = dict((key, {'calls': calls, 'time': seconds})
+                  for key, (calls, seconds) in stats.items())
+
+    with io.open(path, 'w', encoding='utf-8') as fp:
+        fp.write(str(json.dumps(rv, indent=2, sort_keys=True)))
@@ -14,6 +14,11 @@ import shlex
 import codecs
 import traceback
 import glob
+import pickle
+import hashlib
+import tempfile
+import threading
+import multiprocessing
 
 BOM_UTF8 = codecs.BOM_UTF8.decode('utf8')
 
@@ -23,14 +28,17 @@ from datetime import datetime, tzinfo, timedelta
 
 from acrylamid import log, compat
 from acrylamid.errors import AcrylamidException
-from acrylamid.compat import iteritems, string_types, text_type as str
+from acrylamid.compat import PY2K, iteritems, string_types, text_type as str
 
 from acrylamid.utils import (cached_property, Metadata, rchop, lchop,
                              HashableList, force_unicode as u)
 from acrylamid.core import cache
-from acrylamid.filters import FilterTree
+from acrylamid.filters import FilterTree, chain
 from acrylamid.helpers import safeslug, expand, hash
 
+if PY2K:
+    import cPickle as pickle
+
 try:
     import yaml
 except ImportError:
@@ -39,7 +47,7 @@ else:
     yaml.Loader.add_constructor(u'tag:yaml.org,2002:timestamp', lambda x, y: y.value)
 
 
-def load(conf):
+def load(conf, jobs=1, changed=None, known=None):
     """Load and parse textfiles from content directory and optionally filter by an
     ignore pattern. Filenames ending with a known whitelist of extensions are processed.
 
@@ -49,7 +57,11 @@ def load(conf):
     It returns a tuple containing the list of entries sorted by date reverse (newest
     comes first) and other pages (unsorted).
 
-    :param conf: configuration with CONTENT_DIR, CONTENT_EXTENSION and CONTENT_IGNORE set"""
+    :param conf: configuration with CONTENT_DIR, CONTENT_EXTENSION and CONTENT_IGNORE set
+    :param jobs: number of processes to parse new or changed files, see :func:`headers`
+    :param changed: set of paths known to be changed or ``None``
+    :param known: entries of a previous run by filename, re-used (see
+                  :meth:`ContentMixin.reset`) unless their path has `changed`"""
 
     # list of Entry-objects reverse sorted by date.
     entries, pages, trans, drafts = [], [], [], []
@@ -61,27 +73,140 @@ def load(conf):
     else:
         whitelist = tuple(exts)
 
+    paths = [path for path in filelist(conf['content_dir'], conf['content_ignore'])
+             if path.endswith(whitelist)]
+
+    reuse = dict((path, known[path]) for path in paths if known and
+                 changed is not None and path in known and path not in changed)
+    index = headers(paths, jobs, changed)
+
     # collect and skip over malformed entries
-    for path in filelist(conf['content_dir'], conf['content_ignore']):
-        if path.endswith(whitelist):
-            try:
-                entry = Entry(path, conf)
-                if entry.draft:
-                    drafts.append(entry)
-                elif entry.type == 'entry':
-                    entries.append(entry)
-                else:
-                    pages.append(entry)
-            except AcrylamidException as e:
-                log.exception('failed to parse file %s (%s)' % (path, e))
-            except:
-                log.fatal('uncaught exception for ' + path)
-                raise
+    for path in paths:
+        try:
+            if path in reuse:
+                entry = reuse[path]
+                entry.reset()
+            elif isinstance(index[path], Exception):
+                raise index[path]
+            else:
+                entry = Entry(path, conf, index[path])
+            if entry.draft:
+                drafts.append(entry)
+            elif entry.type == 'entry':
+                entries.append(entry)
+            else:
+                pages.append(entry)
+        except AcrylamidException as e:
+            log.exception('failed to parse file %s (%s)' % (path, e))
+        except:
+            log.fatal('uncaught exception for ' + path)
+            raise
 
     # sort by date, reverse
     return sorted(entries, key=lambda k: k.date, reverse=True), pages, trans, drafts
 
 
+def parse(path):
+    """Parse the metadata of a content file and return a tuple of the line
+    number where the actual content begins and the metadata as dictionary."""
+
+    with io.open(path, 'r', encoding='utf-8', errors='replace') as fp:
+
+        peak = lchop(fp.read(512), BOM_UTF8)
+        fp.seek(0)
+
+        if peak.startswith('---\n'):
+            return yamlstyle(fp)
+        elif isrest(peak):
+            return reststyle(fp)
+        elif peak.startswith('% '):
+            return pandocstyle(fp)
+        else:
+            return markdownstyle(fp)
+
+
+def _parse(path):
+    try:
+        return parse(path)
+    except Exception as e:
+        return e
+
+
+def headers(paths, jobs=1, changed=None):
+    """Return a dictionary that maps each path to its parsed header (see
+    :func:`parse`) or to the exception raised while parsing.
+
+    Parsed headers are kept in a persistent index in the cache directory and
+    are re-used as long as modification time and size of the file do not
+    change.  Only new or changed files are parsed, using `jobs` processes if
+    the platform is able to fork.  If the set of `changed` paths is known,
+    files not in this set are not even checked."""
+
+    filename = join(cache.cache_dir, 'headers')
+    version = (1, yaml is not None)
+
+    try:
+        with io.open(filename, 'rb') as fp:
+            index = pickle.load(fp)
+        if index.pop('__version__', None) != version:
+            index = {}
+    except (IOError, OSError):
+        index = {}
+    except Exception as e:
+        log.debug('%s: %s' % (e.__class__.__name__, e))
+        index = {}
+
+    rv, stat, todo = {}, {}, []
+
+    for path in paths:
+        if changed is not None and path not in changed and path in index:
+            stat[path], rv[path] = index[path]
+            continue
+
+        try:
+            st = os.stat(path)
+            stat[path] = (st.st_mtime, st.st_size)
+        except OSError:
+            stat[path] = None
+
+        if path in index and index[path][0] == stat[path]:
+            rv[path] = index[path][1]
+        else:
+            todo.append(path)
+
+    if todo and jobs > 1 and len(todo) > 1 and hasattr(os, 'fork'):
+        ctx = multiprocessing.get_context('fork') if hasattr(
+            multiprocessing, 'get_context') else multiprocessing
+        pool = ctx.Pool(min(jobs, len(todo)))
+
+        try:
+            rv.update(zip(todo, pool.map(_parse, todo, max(1, len(todo) // (jobs * 4)))))
+        except KeyboardInterrupt:
+            pool.terminate()
+            raise
+        else:
+            pool.close()
+        finally:
+            pool.join()
+    else:
+        rv.update((path, _parse(path)) for path in todo)
+
+    if todo or set(index) != set(paths):
+        index = dict((path, (stat[path], rv[path])) for path in paths
+                     if stat[path] is not None and not isinstance(rv[path], Exception))
+        index['__version__'] = version
+
+        try:
+            fd, tmp = tempfile.mkstemp(dir=cache.cache_dir)
+            with io.open(fd, 'wb') as fp:
+                pickle.dump(index, fp, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp, filename)
+        except (IOError, OSError, pickle.PickleError) as e:
+            log.debug('%s: %s' % (e.__class__.__name__, e))
+
+    return rv
+
+
 def ignored(cwd, path, patterns, directory):
     """Test wether a path is excluded by the user. The ignore syntax is
     similar to Git: a path with a leading slash means absolute position
@@ -186,9 +311,8 @@ class Reader(compat.metaclass(abc.ABCMeta, object)):
 
     def __init__(self, conf, meta):
 
-        self.props = Metadata((k, v) for k, v in iteritems(conf)
-            if k in ['author', 'lang', 'email', 'date_format',
-                     'entry_permalink', 'page_permalink'])
+        self.props = Metadata((k, conf[k]) for k in ['author', 'lang', 'email',
+            'date_format', 'entry_permalink', 'page_permalink'] if k in conf)
 
         self.props.update(meta)
         self.type = meta.get('type', 'entry')
@@ -263,25 +387,15 @@ class Reader(compat.metaclass(abc.ABCMeta, object)):
 
 class FileReader(Reader):
 
-    def __init__(self, path, conf):
+    def __init__(self, path, conf, header=None):
 
         self.filename = path
         self.tzinfo = conf.get('tzinfo', None)
         self.defaultcopywildcard = conf.get('copy_wildcard', '_[0-9]*.*')
+        self.validation = conf.get('cache_validation', 'mtime')
 
-        with io.open(path, 'r', encoding='utf-8', errors='replace') as fp:
-
-            peak = lchop(fp.read(512), BOM_UTF8)
-            fp.seek(0)
-
-            if peak.startswith('---\n'):
-                i, meta = yamlstyle(fp)
-            elif isrest(peak):
-                i, meta = reststyle(fp)
-            elif peak.startswith('% '):
-                i, meta = pandocstyle(fp)
-            else:
-                i, meta = markdownstyle(fp)
+        i, meta = header if header is not None else parse(path)
+        meta = dict(meta)
 
         meta['title'] = str(meta['title'])  # YAML can convert 42 to an int
         meta['category'] = lchop(dirname(path) + '/', conf['content_dir']).split('/')
@@ -310,6 +424,19 @@ class FileReader(Reader):
     def lastmodified(self):
         return getmtime(self.filename)
 
+    @cached_property
+    def digest(self):
+        """MD5 digest of the source file and all resources (and their paths)
+        that are copied with this entry."""
+
+        md5 = hashlib.md5()
+        for path in [self.filename] + list(self.resources):
+            md5.update(path.encode('utf-8') + b'\x1e')
+            with io.open(path, 'rb') as fp:
+                for chunk in iter(lambda: fp.read(2**16), b''):
+                    md5.update(chunk)
+        return md5.hexdigest()
+
     @property
     def source(self):
         """Returns the actual, unmodified content."""
@@ -485,6 +612,20 @@ class MetadataMixin(object):
 class ContentMixin(object):
     """Lazy evaluation and content caching + filtering."""
 
+    def __init__(self, *args, **kwargs):
+        self._local = threading.local()
+        super(ContentMixin, self).__init__(*args, **kwargs)
+
+    def getcontext(self):
+        """The view that evaluates :attr:`content`.  The context is local to
+        the current thread, thus views are able to render concurrently."""
+        return getattr(self._local, 'context', None)
+
+    def setcontext(self, view):
+        self._local.context = view
+
+    context = property(getcontext, setcontext, doc=getcontext.__doc__)
+
     @property
     def content(self):
         """Returns the processed content.  This one of the core functions of
@@ -494,17 +635,24 @@ class ContentMixin(object):
 
         The cache is rather dumb: Acrylamid can not determine wether it differs
         only in a single character. Thus, to minimize the overhead the cache
-        object is zlib-compressed."""
+        object is zlib-compressed.
 
-        # previous value
-        pv = None
+        Templates access the content of an entry several times per view (and
+        views such as tag pages even more often), hence the result is kept in
+        :attr:`acrylamid.core.cache.memory` for the current compilation."""
 
         # this is our cache filename
         path = self.cachefilename
 
+        rv = cache.memory.get((path, self.context))
+        if rv is not None:
+            return rv
+
+        # previous value
+        pv = None
+
         # remove *all* intermediates when entry has been modified
-        if cache.getmtime(path) > 0.0 and self.modified:
-            cache.remove(path)
+        self.purge()
 
         if self.hasproperty('copy'):
             res = self.resources
@@ -527,8 +675,7 @@ class ContentMixin(object):
                 rv = cache.get(path, key)
                 if rv is None:
                     res = self.source if pv is None else pv
-                    for f in fxs:
-                        res = f.transform(res, self, *f.args)
+                    res = chain(fxs, res, self)
                     pv = cache.set(path, key, res)
                 else:
                     pv = rv
@@ -536,10 +683,49 @@ class ContentMixin(object):
                 # jinja2 will ignore these Exceptions, better to catch them before
                 traceback.print_exc(file=sys.stdout)
 
+        if pv is not None:
+            cache.memory.set((path, self.context), pv)
+
         return pv
 
+    def purge(self):
+        """Remove all intermediates if the entry has been modified.  This is
+        done only once per compilation, hence all views (and the pre-rendering
+        workers, see :func:`acrylamid.commands.prerender`) share the freshly
+        computed intermediates."""
+
+        if self.__dict__.get('_purged', False):
+            return
+
+        with cache.lock:
+            if not self.__dict__.get('_purged', False):
+                if self.modified:
+                    if cache.getmtime(self.cachefilename) > 0.0:
+                        cache.remove(self.cachefilename)
+                    if self.validation == 'digest':
+                        cache.set(self.cachefilename, 'digest', self.digest)
+                self._purged = True
+
+    def reset(self):
+        """Forget everything that is evaluated once per compilation, e.g.
+        the modified state and the filter tree, to re-use this entry in the
+        next compilation of a long-running process (``autocompile``)."""
+
+        for attr in 'modified', 'digest', 'resources', '_purged':
+            self.__dict__.pop(attr, None)
+
+        self.filters = self.filters[:]
+
     @cached_property
     def modified(self):
+        """Whether the entry has been modified since the last compilation.
+        Either compares the modification time of the source with the cache
+        object (default) or, if ``CACHE_VALIDATION`` is set to ``'digest'``,
+        the stored content :attr:`digest`, which survives a fresh checkout."""
+
+        if self.validation == 'digest':
+            return cache.get(self.cachefilename, 'digest') != self.digest
+
         changed = self.lastmodified > cache.getmtime(self.cachefilename)
         # skip resource check if changed is true
         if not changed and self.hasproperty('copy'):
@@ -672,15 +858,88 @@ def isrest(peak):
     return len(b) >= len(a)
 
 
+def fieldlist(lines):
+    """Parse a reStructuredText field list without docutils.  Only plain text
+    values are supported, for inline markup, lists, tabs, nested blocks and
+    bibliographic fields with special treatment (authors, abstract and
+    dedication) this returns None and you need :func:`docinfo`.
+
+    :param lines: the lines of the field list
+    :returns: list of (name, value) tuples or None"""
+
+    # field marker and a (plain) field name, see docutils.parsers.rst.states
+    field_re = re.compile(r'^:([^\s:][^:]*(?<!\s)):(?: +(.*))?$')
+
+    # inline markup, escapes, literal block markers and RCS keywords
+    markup_re = re.compile(r'[*`|\\$]|(?<!\w)_|_(?!\w)|::')
+
+    # anything that starts a new block such as lists, tables and comments
+    block_re = re.compile(r'^(?:[-+*/>:|.#()\u2022\u2023\u2043]|\w+[.)](?: |$)|\W*$)', re.U)
+
+    fields, indent = [], None
+
+    for line in lines:
+        line = line.rstrip()
+
+        if '\t' in line:
+            return None
+
+        m = field_re.match(line)
+        if m:
+            fields.append((m.group(1), [m.group(2)] if m.group(2) else []))
+            indent = None
+        elif fields and line[:1] == ' ':
+            text = line.lstrip()
+            if indent is None:
+                indent = len(line) - len(text)
+            elif len(line) - len(text) != indent:
+                return None
+            fields[-1][1].append(text)
+        else:
+            return None
+
+    rv = []
+    for name, body in fields:
+        if not body or ' '.join(name.lower().split()) in ('authors', 'abstract', 'dedication'):
+            return None
+
+        if markup_re.search(name) or any(markup_re.search(line) or block_re.match(line)
+                                         for line in body):
+            return None
+
+        rv.append((name, '\n'.join(body)))
+
+    return rv
+
+
+def docinfo(text):
+    """Parse the field list `text` with docutils.
+
+    :returns: list of (name, value) tuples"""
+
+    import docutils
+    from docutils.core import publish_doctree
+
+    rv = []
+    document = publish_doctree(text)
+
+    for info in document.traverse(docutils.nodes.docinfo):
+        for element in info.children:
+            if element.tagname == 'field':  # custom fields
+                name_elem, body_elem = element.children
+                rv.append((name_elem.astext(), body_elem.astext()))
+            else:  # standard fields (e.g. filters)
+                rv.append((element.tagname, element.astext()))
+
+    return rv
+
+
 def reststyle(fileobj):
     """Parse metadata from reStructuredText document when the first two lines are
     valid reStructuredText headlines followed by metadata fields.
 
     -- http://docutils.sourceforge.net/docs/ref/rst/restructuredtext.html#field-lists"""
 
-    import docutils
-    from docutils.core import publish_doctree
-
     title = fileobj.readline().strip('\n')
     dash = fileobj.readline().strip('\n')
 
@@ -703,26 +962,21 @@ def reststyle(fileobj):
         else:
             meta.append(line)
 
-    document = publish_doctree(''.join(meta))
+    fields = fieldlist(meta)
+    if fields is None:
+        fields = docinfo(''.join(meta))
+
     meta = dict(title=title)
 
-    for docinfo in document.traverse(docutils.nodes.docinfo):
-        for element in docinfo.children:
-            if element.tagname == 'field':  # custom fields
-                name_elem, body_elem = element.children
-                name = name_elem.astext()
-                value = body_elem.astext()
-            else:  # standard fields (e.g. filters)
-                name = element.tagname
-                value = element.astext()
-            name = name.lower()
+    for name, value in fields:
+        name = name.lower()
 
-            if '\n\n' in value:
-                value = value.split('\n\n')  # Y U NO DETECT UR LISTS?
-            elif '\n' in value:
-                value = value.replace('\n', ' ')  # linebreaks in wrapped sentences
+        if '\n\n' in value:
+            value = value.split('\n\n')  # Y U NO DETECT UR LISTS?
+        elif '\n' in value:
+            value = value.replace('\n', ' ')  # linebreaks in wrapped sentences
 
-            meta[name] = distinguish(value.split('\n\n') if '\n\n' in value else value)
+        meta[name] = distinguish(value.split('\n\n') if '\n\n' in value else value)
 
     return i, meta
 
@@ -0,0 +1,41 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright 2012 Martin Zimmermann <info@posativ.org>. All rights reserved.
+# License: BSD Style, 2 clauses -- see LICENSE.
+
+from acrylamid import log, readers, commands
+from acrylamid.core import cache, Directory
+from acrylamid.tasks import task, argument
+
+arguments = [
+    argument("action", choices=["gc"], help="gc: remove orphaned cache objects"),
+    argument("-n", "--dry-run", dest="dryrun", action="store_true", default=False,
+        help="show what would be removed")
+]
+
+
+@task('cache', arguments=arguments, help="manage the cache")
+def run(conf, env, options):
+    """Subcommand: cache -- manage the cache, currently only garbage collection
+    of cache objects whose source file has been removed or renamed."""
+
+    commands.initialize(conf, env)
+
+    entrylist, pages, translations, drafts = readers.load(conf)
+    alive = set(entry.cachefilename for entry in entrylist + pages + translations + drafts)
+
+    count, size = 0, 0
+    for path, objsize, atime in cache.objects():
+        if path in alive or not Directory.pattern.match(path):
+            continue
+
+        count, size = count + 1, size + objsize
+        if options.dryrun:
+            log.info('remove  %s', path)
+        else:
+            cache.remove(path)
+
+    log.info('%s %i orphaned cache objects (%.2f mb)',
+             'found' if options.dryrun else 'removed', count, size / 1024.0**2)
+
+    cache.shutdown()
@@ -5,6 +5,7 @@
 #
 # Provide a homogenous interface to Templating Engines like Jinja2
 
+import os
 import abc
 
 
@@ -15,6 +16,10 @@ class AbstractEnvironment(object):
 
     extension = ['.html']
 
+    #: whether :meth:`invalidate` is implemented and the environment can be
+    #: re-used in the next compilation
+    warm = False
+
     @abc.abstractmethod
     def __init__(self, layoutdir, cachedir):
         """Initialize templating engine and set default layoutdir as well
@@ -42,6 +47,24 @@ class AbstractEnvironment(object):
     def loader(self):
         return
 
+    def invalidate(self, paths):
+        """Forget the modification state of all templates to re-use this
+        environment in the next compilation.  Templates are loaded again if
+        any path in :param paths: (or ``None`` for unknown) is a template.
+        Only called if :attr:`warm` is True."""
+        return
+
+
+def changed(directories, paths):
+    """Return whether any of :param paths: is located in :param directories:
+    (or the changes are unknown)."""
+
+    if paths is None:
+        return True
+
+    directories = [os.path.abspath(d) + os.sep for d in directories if d]
+    return any(os.path.abspath(p).startswith(tuple(directories)) for p in paths)
+
 
 class AbstractTemplate(object):
 
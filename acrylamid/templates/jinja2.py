@@ -12,7 +12,8 @@ from collections import defaultdict
 from jinja2 import Environment as J2Environemnt, FileSystemBytecodeCache
 from jinja2 import FileSystemLoader, meta, nodes
 
-from acrylamid.templates import AbstractEnvironment, AbstractTemplate
+from acrylamid import profiler
+from acrylamid.templates import AbstractEnvironment, AbstractTemplate, changed
 
 try:
     from acrylamid.assets.web import Mixin
@@ -106,6 +107,7 @@ class ExtendedFileSystemLoader(FileSystemLoader):
 class Environment(AbstractEnvironment):
 
     extension = ['.html', '.j2']
+    warm = True
     loader = None
 
     def __init__(self, layoutdir, cachedir):
@@ -140,10 +142,25 @@ class Environment(AbstractEnvironment):
     def extend(self, path):
         self.loader.searchpath.append(path)
 
+    def invalidate(self, paths):
+
+        self.templates = {}
+
+        if changed(self.loader.searchpath, paths):
+            self.loader.modified = {'macros.html': False}
+            self.loader.resolved.clear()
+            self.loader.assets.clear()
+            if self._jinja2.cache is not None:
+                self._jinja2.cache.clear()
+        else:
+            for name in self.loader.modified:
+                self.loader.modified[name] = False
+
 
 class Template(AbstractTemplate, Mixin):
 
     def render(self, **kw):
         buf = StringIO()
-        self.template.stream(**kw).dump(buf)
+        with profiler.timed('template:' + self.path):
+            self.template.stream(**kw).dump(buf)
         return buf
@@ -16,7 +16,8 @@ from os.path import getmtime, isfile
 from itertools import chain
 from collections import defaultdict
 
-from acrylamid.templates import AbstractEnvironment, AbstractTemplate
+from acrylamid import profiler
+from acrylamid.templates import AbstractEnvironment, AbstractTemplate, changed
 from mako.lookup import TemplateLookup
 from mako import exceptions, runtime
 
@@ -144,6 +145,7 @@ class ExtendedLookup(TemplateLookup):
 class Environment(AbstractEnvironment):
 
     extension = ['.html', '.mako']
+    warm = True
 
     def __init__(self, layoutdirs, cachedir):
         self._mako = ExtendedLookup(
@@ -167,6 +169,17 @@ class Environment(AbstractEnvironment):
     def extend(self, path):
         self._mako.directories.append(path)
 
+    def invalidate(self, paths):
+
+        if changed(self._mako.directories, paths):
+            self._mako.modified = {'macros.html': False}
+            self._mako.resolved.clear()
+            self._mako.assets.clear()
+            self._mako._collection.clear()
+        else:
+            for name in self._mako.modified:
+                self._mako.modified[name] = False
+
     @property
     def loader(self):
         return self._mako
@@ -180,7 +193,8 @@ class Template(AbstractTemplate, Mixin):
         kw.update(self.engine.filters)
         buf = io.StringIO()
         ctx = runtime.Context(buf, **kw)
-        self.template.render_context(ctx)
+        with profiler.timed('template:' + self.path):
+            self.template.render_context(ctx)
         return buf
         # For debugging template compilation:
         # TODO: Integrate this with acrylamid somehow
@@ -14,6 +14,7 @@ import zlib
 import locale
 import functools
 import itertools
+import threading
 
 try:
     from collections import OrderedDict
@@ -143,6 +144,49 @@ class memoized(object):
         return functools.partial(self.__call__, obj)
 
 
+class LRU(object):
+    """A thread-safe mapping of at most `maxsize` items that discards the
+    least recently used item when full.  :attr:`hits` and :attr:`misses`
+    count the lookups via :meth:`get`."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.items.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self.items[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items.pop(key, None)
+            self.items[key] = value
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+        return value
+
+    def clear(self):
+        """Remove all items and reset the counters."""
+        with self.lock:
+            self.items.clear()
+            self.hits = self.misses = 0
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+
 def find(fname, directory):
     """Find `fname` in `directory`, if not found try the parent folder until
     we find `fname` (as full path) or raise an :class:`IOError`."""
@@ -9,6 +9,7 @@ from os.path import isfile
 from functools import partial
 
 from acrylamid import helpers, utils, log
+from acrylamid.core import tracker
 from acrylamid.errors import AcrylamidException
 from acrylamid.compat import iteritems, string_types
 from acrylamid.helpers import paginate, link, joinurl, event, expand, union
@@ -67,7 +68,8 @@ def index_views(conf, env, urlmap, module):
             kwargs['condition'] = kwargs.pop('if', None)
 
             m = mem(**kwargs)
-            m.init(conf, env, **m._getkwargs())
+            with tracker.record(m):
+                m.init(conf, env, **m._getkwargs())
 
             __views_list.append(m)
             urlmap.remove((rule, view))
@@ -143,6 +145,11 @@ class View(object):
             event.skip('ns', path)
             continue
 
+    Instead of ``conf.modified`` and ``env.modified`` (which change on any
+    edit of :doc:`conf.py`) use :meth:`acrylamid.core.tracker.modified` that
+    only considers the configuration and environment keys your view (and its
+    templates) actually used during the previous compilation.
+
     See the source of acrylamid's built-in views that all have implemented
     skipping. If you skip over entries you can take full advantage of lazy
     evaluation (no need to initialize filters, recompile/load from cache).
@@ -268,6 +275,8 @@ class Paginator(object):
             self.items_per_page = 10
         if 'pagination' not in kwargs:
             self.pagination = self.path + ':num/'
+        if 'reverse_pagination' not in kwargs:
+            self.reverse_pagination = False
 
         self.export.append('curr_page')
 
@@ -282,25 +291,28 @@ class Paginator(object):
 
         route = expand(self.path, kwargs)
         entrylist = data['entrylist']
-        paginator = paginate(entrylist, ipp, route, conf.default_orphans)
+        paginator = paginate(entrylist, ipp, route, conf.default_orphans,
+                             self.reverse_pagination)
 
-        for (next, curr, prev), entrylist, modified in paginator:
+        # the first page renders to route, usually page 1
+        first = None
 
-            curr_page = curr
+        for (next, curr, prev), entrylist, modified in paginator:
 
-            next = None if next is None \
-                else link(u'Next', expand(self.path, kwargs)) if next == 1 \
-                    else link(u'Next', expand(self.pagination, union({'num': next}, kwargs)))
+            if first is None:
+                first = curr
 
-            curr = link(curr, expand(self.path, kwargs)) if curr == 1 \
-                else link(curr, expand(self.pagination, union({'num': curr}, kwargs)))
+            curr_page = curr
+            href = lambda num: expand(self.path, kwargs) if num == first \
+                else expand(self.pagination, union({'num': num}, kwargs))
 
-            prev = None if prev is None \
-               else link(u'Previous', expand(self.pagination, union({'num': prev}, kwargs)))
+            next = None if next is None else link(u'Next', href(next))
+            curr = link(curr, href(curr))
+            prev = None if prev is None else link(u'Previous', href(prev))
 
             path = joinurl(conf['output_dir'], curr.href)
 
-            if isfile(path) and not (modified or tt.modified or env.modified or conf.modified):
+            if isfile(path) and not (modified or tt.modified or tracker.modified(self)):
                 event.skip(self.__class__.__name__.lower(), path)
                 continue
 
@@ -6,6 +6,7 @@
 from os.path import isfile
 
 from acrylamid.utils import neighborhood, groupby
+from acrylamid.core import tracker
 from acrylamid.views import View
 from acrylamid.helpers import union, joinurl, event, expand, memoize, hash, link
 from acrylamid.readers import Date
@@ -168,7 +169,7 @@ class Archive(View):
                 map(lambda x: '%02i' % x if x else None, keyfunc(group[0]))
             )))()
 
-            if isfile(path) and not (modified or tt.modified or env.modified or conf.modified):
+            if isfile(path) and not (modified or tt.modified or tracker.modified(self)):
                 event.skip('archive', path)
                 continue
 
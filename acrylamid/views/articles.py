@@ -3,6 +3,7 @@
 # Copyright 2012 Martin Zimmermann <info@posativ.org>. All rights reserved.
 # License: BSD Style, 2 clauses -- see LICENSE.
 
+from acrylamid.core import tracker
 from acrylamid.views import View
 from acrylamid.helpers import union, joinurl, event
 
@@ -46,7 +47,7 @@ class Articles(View):
         tt = env.engine.fromfile(env, self.template)
         path = joinurl(conf['output_dir'], self.path, 'index.html')
 
-        if exists(path) and not (conf.modified or env.modified or tt.modified):
+        if exists(path) and not (tracker.modified(self) or tt.modified):
             event.skip('article', path)
             raise StopIteration
 
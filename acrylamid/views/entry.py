@@ -15,6 +15,7 @@ from acrylamid.errors import AcrylamidException
 from acrylamid.compat import metaclass, filter
 from acrylamid.helpers import expand, union, joinurl, event, link, mkfile
 
+from acrylamid.core import tracker
 from acrylamid.refs import modified, references
 from acrylamid.views import View
 
@@ -39,7 +40,7 @@ class Base(metaclass(abc.ABCMeta, View)):
     def generate(self, conf, env, data):
 
         pathes, entrylist = set(), data[self.type]
-        unmodified = not env.modified and not conf.modified
+        unmodified = not tracker.modified(self)
 
         for i, entry in enumerate(entrylist):
 
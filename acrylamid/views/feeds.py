@@ -8,6 +8,7 @@ from datetime import datetime, timedelta
 from wsgiref.handlers import format_date_time
 
 from acrylamid.utils import HashableList, total_seconds
+from acrylamid.core import tracker
 from acrylamid.views import View, tag
 from acrylamid.compat import text_type as str
 from acrylamid.helpers import joinurl, event, expand, union
@@ -64,7 +65,7 @@ class Feed(View):
         path = joinurl(conf['output_dir'], self.route)
         modified = any(entry.modified for entry in entrylist)
 
-        if isfile(path) and not (conf.modified or env.modified or tt.modified or modified):
+        if isfile(path) and not (tracker.modified(self) or tt.modified or modified):
             event.skip(self.name, path)
             raise StopIteration
 
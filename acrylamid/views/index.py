@@ -19,7 +19,12 @@ class Index(View, Paginator):
             'pagination': '/page/:num/',
             'items_per_page': 10
         }
-    """
+
+    With ``'reverse_pagination': True`` pages are numbered from the oldest
+    entry, the first page shows the newest (and not necessarily a full page
+    of) entries.  Older pages stay the same when you publish a new entry,
+    thus only the first (and sometimes the second) page has to be rendered
+    again."""
 
     export = ['prev', 'curr', 'next', 'items_per_page', 'entrylist']
     template = 'main.html'
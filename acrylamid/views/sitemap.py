@@ -9,6 +9,7 @@ from time import strftime, gmtime
 from os.path import getmtime, exists, splitext, basename
 from xml.sax.saxutils import escape
 
+from acrylamid.core import tracker
 from acrylamid.views import View
 from acrylamid.compat import PY2K
 from acrylamid.helpers import event, joinurl, rchop
@@ -97,11 +98,12 @@ class Sitemap(View):
         path = joinurl(conf['output_dir'], self.path)
         sm = Map()
 
-        if exists(path) and not self.modified and not conf.modified:
+        if exists(path) and not self.modified and not tracker.modified(self):
             event.skip('sitemap', path)
             raise StopIteration
 
-        for ns, fname in self.files:
+        # a stable order, skipped and rendered files are tracked differently
+        for ns, fname in sorted(self.files, key=lambda item: item[1]):
 
             if ns == 'draft':
                 continue
@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+#
+# Copyright 2012 Martin Zimmermann <info@posativ.org>. All rights reserved.
+# License: BSD Style, 2 clauses -- see LICENSE.
+#
+# Build speed benchmark on a synthetic blog.
+
+"""
+Generates a synthetic blog (entries with configurable tag and category
+distribution written in Markdown, reStructuredText and HTML, compiled with the
+built-in filters and views) and measures the wall time of the following
+scenarios:
+
+    cold      compile without cache and output
+    noop      recompile without any change
+    entry     recompile after editing a single entry
+    template  recompile after editing the base template
+    conf      recompile after editing conf.py
+
+Results are written as JSON and can be compared against a previous run to
+flag regressions::
+
+    $ python misc/benchmark.py -n 500 -o baseline.json
+    $ python misc/benchmark.py -n 500 --baseline baseline.json
+"""
+
+from __future__ import print_function, division
+
+import sys
+import os
+import io
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from os.path import join, dirname, abspath, isdir
+
+ROOT = dirname(dirname(abspath(__file__)))
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod '
+         'tempor incididunt labore dolore magna aliqua enim minim veniam quis '
+         'nostrud exercitation ullamco laboris nisi aliquip commodo consequat '
+         'internationalization hyphenation extraordinary acrylamid Python HTML '
+         'CSS NASA').split()
+
+SCENARIOS = ['cold', 'noop', 'entry', 'template', 'conf']
+
+CONF = """\
+# -*- encoding: utf-8 -*-
+
+SITENAME = 'Benchmark'
+WWW_ROOT = 'http://example.com/'
+AUTHOR = 'Benchmark'
+
+FILTERS = ['markdown', 'h1']
+VIEWS = {
+    '/': {'filters': 'summarize', 'view': 'index',
+          'pagination': '/page/:num/'},
+    '/:year/:slug/': {'views': ['entry', 'draft']},
+    '/tag/:name/': {'filters': 'summarize', 'view': 'tag',
+                    'pagination': '/tag/:name/:num/'},
+    '/:year/': {'view': 'archive'},
+    '/category/:name/': {'filters': 'summarize', 'view': 'category'},
+    '/atom/': {'filters': 'h2', 'view': 'atom'},
+    '/rss/': {'filters': 'h2', 'view': 'rss'},
+    '/articles/': {'view': 'articles'},
+    '/sitemap.xml': {'view': 'sitemap'},
+}
+"""
+
+LAYOUTS = {
+    'base.html': (
+        '<!DOCTYPE html>\n<html><head><title>{{ conf.sitename }}</title></head>\n'
+        '<body>{% block content %}{% endblock %}</body></html>\n'),
+    'main.html': (
+        '{% extends "base.html" %}{% block content %}\n'
+        '{% for entry in env.entrylist %}<article><h1>{{ entry.title }}</h1>\n'
+        '<p>{% for link in entry.tags | tagify %}<a href="{{ link.href }}">'
+        '{{ link.title }}</a> {% endfor %}</p>\n{{ entry.content }}</article>\n'
+        '{% endfor %}{% if env.prev %}<a href="{{ env.path + env.prev.href }}">older</a>'
+        '{% endif %}{% if env.next %}<a href="{{ env.path + env.next.href }}">newer</a>'
+        '{% endif %}{% endblock %}\n'),
+    'listing.html': (
+        '{% extends "base.html" %}{% block content %}\n'
+        '{% for entry in env.entrylist %}<a href="{{ entry.permalink }}">'
+        '{{ entry.title }}</a>\n{% endfor %}{% endblock %}\n'),
+    'articles.html': (
+        '{% extends "base.html" %}{% block content %}\n'
+        '{% for year, entries in articles.items() %}<h2>{{ year }}</h2>\n'
+        '{% for entry in entries %}<a href="{{ entry.permalink }}">{{ entry.title }}'
+        '</a>\n{% endfor %}{% endfor %}{% endblock %}\n'),
+    'atom.xml': (
+        '<?xml version="1.0" encoding="utf-8"?>\n<feed>{% for entry in env.entrylist %}'
+        '<entry><title>{{ entry.title }}</title><content type="html">'
+        '{{ entry.content | e }}</content></entry>{% endfor %}</feed>\n'),
+    'rss.xml': (
+        '<?xml version="1.0" encoding="utf-8"?>\n<rss><channel>'
+        '{% for entry in env.entrylist %}<item><title>{{ entry.title }}</title>'
+        '<description>{{ entry.content | e }}</description></item>{% endfor %}'
+        '</channel></rss>\n'),
+}
+
+
+def sentence(rnd, n):
+    words = [rnd.choice(WORDS) for i in range(n)]
+    return ' '.join(words).capitalize() + '.'
+
+
+def paragraph(rnd):
+    return ' '.join(sentence(rnd, rnd.randint(6, 18)) for i in range(rnd.randint(3, 8)))
+
+
+def markdown(rnd, meta):
+    head = ['%s: %s' % (k, v) for k, v in meta]
+    body = []
+    for i in range(rnd.randint(4, 10)):
+        body.append(paragraph(rnd))
+        if rnd.random() < 0.3:
+            body.append('## ' + sentence(rnd, 4))
+        if rnd.random() < 0.2:
+            body.append('\n'.join('- *%s* [%s](/%s/)' % (sentence(rnd, 3),
+                rnd.choice(WORDS), rnd.choice(WORDS)) for i in range(4)))
+        if rnd.random() < 0.2:
+            body.append('\n'.join('    for i in range(%i):\n        print(i)' % i
+                                  for i in range(3)))
+    return '---\n%s\n---\n\n%s\n' % ('\n'.join(head), '\n\n'.join(body))
+
+
+def rest(rnd, meta):
+    title = dict(meta)['title']
+    head = [':%s: %s' % (k, v) for k, v in meta if k != 'title']
+    body = []
+    for i in range(rnd.randint(4, 10)):
+        body.append(paragraph(rnd))
+        if rnd.random() < 0.3:
+            headline = sentence(rnd, 4)
+            body.append(headline + '\n' + '-' * len(headline))
+        if rnd.random() < 0.2:
+            body.append('\n'.join('* *%s* `%s <http://example.com/%s/>`_' % (
+                sentence(rnd, 3), rnd.choice(WORDS), i) for i in range(4)))
+    return '%s\n%s\n\n%s\n\n%s\n' % (title, '#' * len(title), '\n'.join(head),
+                                      '\n\n'.join(body))
+
+
+def html(rnd, meta):
+    head = ['%s: %s' % (k, v) for k, v in meta]
+    body = []
+    for i in range(rnd.randint(4, 10)):
+        body.append('<p>%s</p>' % paragraph(rnd))
+        if rnd.random() < 0.3:
+            body.append('<h2>%s</h2>' % sentence(rnd, 4))
+        if rnd.random() < 0.2:
+            body.append('<ul>%s</ul>' % ''.join('<li><em>%s</em></li>' % sentence(rnd, 3)
+                                              for i in range(4)))
+    return '---\n%s\n---\n\n%s\n' % ('\n'.join(head), '\n'.join(body))
+
+
+def generate(path, entries=100, tags=30, categories=5, mix=None, seed=42):
+    """Write a synthetic blog to `path`."""
+
+    rnd = random.Random(seed)
+    mix = mix or {'markdown': 0.6, 'rst': 0.2, 'html': 0.2}
+    formats = [(fmt, weight) for fmt, weight in sorted(mix.items()) if weight > 0]
+
+    os.makedirs(join(path, 'layouts'))
+    for name, source in LAYOUTS.items():
+        with io.open(join(path, 'layouts', name), 'w', encoding='utf-8') as fp:
+            fp.write(source)
+
+    with io.open(join(path, 'conf.py'), 'w', encoding='utf-8') as fp:
+        fp.write(CONF)
+
+    # tags follow a power law, a few tags are very common
+    tagnames = ['tag%i' % i for i in range(tags)]
+    weights = [1.0 / (i + 1) for i in range(tags)]
+
+    for i in range(entries):
+
+        x, fmt = rnd.random() * sum(w for f, w in formats), formats[-1][0]
+        for f, w in formats:
+            if x < w:
+                fmt = f
+                break
+            x -= w
+
+        category = 'category%i' % rnd.randrange(categories) if categories else ''
+        directory = join(path, 'content', category)
+        if not isdir(directory):
+            os.makedirs(directory)
+
+        entrytags = set()
+        while tagnames and len(entrytags) < min(rnd.randint(1, 4), tags):
+            entrytags.add(rnd.choices(tagnames, weights)[0] if hasattr(rnd, 'choices')
+                          else rnd.choice(tagnames))
+
+        meta = [('title', 'Entry %i %s' % (i, sentence(rnd, 3).rstrip('.'))),
+                ('date', '%04i-%02i-%02i %02i:%02i' % (2008 + i % 6, 1 + i % 12,
+                    1 + i % 28, i % 24, i % 60)),
+                ('tags', '[%s]' % ', '.join(sorted(entrytags)))]
+
+        if fmt == 'rst':
+            ext, source = '.rst', rest(rnd, meta + [('filter', 'rst')])
+        elif fmt == 'html':
+            ext, source = '.txt', html(rnd, meta + [('filter', 'html')])
+        else:
+            ext, source = '.txt', markdown(rnd, meta)
+
+        with io.open(join(directory, 'entry%05i%s' % (i, ext)), 'w', encoding='utf-8') as fp:
+            fp.write(source)
+
+
+def compile(path, python, args):
+    """Run ``acrylamid compile`` in `path` and return the wall time."""
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [ROOT] + [p for p in os.environ.get('PYTHONPATH', '').split(os.pathsep) if p]))
+    cmd = [python, '-c', 'import sys; from acrylamid import acryl; sys.exit(acryl())',
+           'compile', '-q'] + args
+
+    start = time.time()
+    proc = subprocess.Popen(cmd, cwd=path, env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT)
+    output = proc.communicate()[0]
+    seconds = time.time() - start
+
+    if proc.returncode != 0:
+        raise SystemExit('compile failed:\n' + output.decode('utf-8', 'replace'))
+    return seconds
+
+
+def append(path, text):
+    with io.open(path, 'a', encoding='utf-8') as fp:
+        fp.write(text)
+    # make sure mtime-based checks notice the change
+    mtime = time.time() + 1
+    os.utime(path, (mtime, mtime))
+
+
+def run(path, python, args, runs=3, scenarios=SCENARIOS):
+    """Measure each scenario `runs` times, return a dict of timings."""
+
+    results = dict((name, []) for name in scenarios)
+    entries = sorted(join(root, f) for root, dirs, files in os.walk(join(path, 'content'))
+                     for f in files)
+
+    for i in range(runs):
+        for name in scenarios:
+            if name == 'cold':
+                shutil.rmtree(join(path, '.cache'), ignore_errors=True)
+                shutil.rmtree(join(path, 'output'), ignore_errors=True)
+            else:
+                # warm up cache and output first
+                if not isdir(join(path, 'output')):
+                    compile(path, python, args)
+
+                if name == 'entry':
+                    append(entries[i % len(entries)], '\nEdited in run %i.\n' % i)
+                elif name == 'template':
+                    append(join(path, 'layouts', 'base.html'), '<!-- run %i -->\n' % i)
+                elif name == 'conf':
+                    append(join(path, 'conf.py'), "BENCHMARK_RUN = %i\n" % i)
+
+            results[name].append(compile(path, python, args))
+
+    return dict((name, {'min': min(times), 'median': sorted(times)[len(times) // 2],
+                        'runs': times}) for name, times in results.items())
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison table and return a list of regressed scenarios."""
+
+    regressions = []
+    print('%-10s %10s %10s %8s' % ('scenario', 'baseline', 'current', 'change'))
+
+    for name in SCENARIOS:
+        if name not in results:
+            continue
+
+        current = results[name]['min']
+        if name not in baseline:
+            print('%-10s %10s %9.3fs' % (name, '-', current))
+            continue
+
+        previous = baseline[name]['min']
+        change = (current - previous) / previous if previous else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('%-10s %9.3fs %9.3fs %+7.1f%%%s' % (name, previous, current, change * 100, flag))
+
+    return regressions
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip(),
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--entries', type=int, default=100,
+                        help='number of entries (default: 100)')
+    parser.add_argument('--tags', type=int, default=30, help='number of distinct tags')
+    parser.add_argument('--categories', type=int, default=5, help='number of categories')
+    parser.add_argument('--mix', default='markdown=0.6,rst=0.2,html=0.2',
+                        help='share of markdown, rst and html entries')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('-r', '--runs', type=int, default=3,
+                        help='runs per scenario, the minimum is compared')
+    parser.add_argument('-s', '--scenarios', default=','.join(SCENARIOS),
+                        help='comma-separated list of scenarios')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='passed to acrylamid compile')
+    parser.add_argument('--python', default=sys.executable,
+                        help='interpreter running acrylamid')
+    parser.add_argument('-o', '--output', metavar='FILE', help='write results as JSON')
+    parser.add_argument('--baseline', metavar='FILE', help='compare with previous results')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown flagged as regression (default: 0.1)')
+    parser.add_argument('--keep', metavar='DIR', help='generate the blog into DIR and keep it')
+
+    options = parser.parse_args(argv)
+
+    mix = dict((k, float(v)) for k, v in (item.split('=') for item in options.mix.split(',')))
+    scenarios = [s for s in options.scenarios.split(',') if s]
+    for name in scenarios:
+        if name not in SCENARIOS:
+            parser.error('unknown scenario %r' % name)
+
+    path = options.keep or tempfile.mkdtemp(prefix='acrylamid-benchmark-')
+    if options.keep and isdir(path):
+        shutil.rmtree(path)
+
+    try:
+        generate(path, options.entries, options.tags, options.categories, mix, options.seed)
+        args = ['-j', str(options.jobs)] if options.jobs > 1 else []
+        results = run(path, options.python, args, options.runs, scenarios)
+    finally:
+        if not options.keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+    rv = {
+        'meta': {
+            'entries': options.entries, 'tags': options.tags,
+            'categories': options.categories, 'mix': mix, 'seed': options.seed,
+            'runs': options.runs, 'jobs': options.jobs,
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+    if options.output:
+        with io.open(options.output, 'w', encoding='utf-8') as fp:
+            fp.write(u'%s\n' % json.dumps(rv, indent=2, sort_keys=True))
+
+    baseline = {}
+    if options.baseline:
+        with io.open(options.baseline, encoding='utf-8') as fp:
+            baseline = json.load(fp)
+        if baseline.get('meta', {}).get('entries') != options.entries:
+            print('warning: baseline was measured with a different number of entries')
+
+    regressions = compare(results, baseline.get('results', {}), options.threshold)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+#
+# Copyright 2012 Martin Zimmermann <info@posativ.org>. All rights reserved.
+# License: BSD Style, 2 clauses -- see LICENSE.
+#
+# Compare acrylamid's regex tokenizer with the stdlib HTML parser.
+
+"""
+Parses HTML files (by default the compiled blog in ``output/``) with the
+stdlib parser and with :func:`acrylamid.lib.html.scan`, verifies that both
+produce the same handler calls and reports the time spent::
+
+    $ acrylamid compile
+    $ python misc/benchmark_html.py output/
+"""
+
+from __future__ import print_function, division
+
+import sys
+import os
+import io
+import timeit
+import argparse
+
+from os.path import join, dirname, abspath, isdir
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from acrylamid.lib.html import HTMLParser, scan
+
+
+class Recorder(HTMLParser):
+    """Record all handler calls instead of writing HTML."""
+
+    def __init__(self, html):
+        self.calls = []
+        super(Recorder, self).__init__(html)
+
+    def handle_starttag(self, tag, attrs):
+        self.calls.append(('starttag', tag, attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.calls.append(('startendtag', tag, attrs))
+
+    def handle_endtag(self, tag):
+        self.calls.append(('endtag', tag))
+
+    def handle_data(self, data):
+        self.calls.append(('data', data))
+
+    def handle_entityref(self, name):
+        self.calls.append(('entityref', name))
+
+    def handle_charref(self, char):
+        self.calls.append(('charref', char))
+
+    def handle_comment(self, comment):
+        self.calls.append(('comment', comment))
+
+
+def documents(paths, extensions=('.html', '.htm', '.xml')):
+
+    for path in paths:
+        if not isdir(path):
+            yield path
+            continue
+
+        for root, dirs, files in os.walk(path):
+            for fname in sorted(files):
+                if fname.endswith(extensions):
+                    yield join(root, fname)
+
+
+def measure(docs, fast, runs):
+
+    HTMLParser.fast = fast
+    return min(timeit.repeat(lambda: [HTMLParser(doc) for doc in docs], number=1, repeat=runs))
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n\n')[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=['output'],
+                        help='HTML files or directories (default: output/)')
+    parser.add_argument('-r', '--runs', type=int, default=5,
+                        help='runs per parser, the minimum is reported')
+
+    options = parser.parse_args(argv)
+
+    if not HTMLParser.fast:
+        print('the regex tokenizer requires Python 3.5 or later')
+        return 1
+
+    docs = []
+    for path in documents(options.paths):
+        with io.open(path, encoding='utf-8', errors='replace') as fp:
+            docs.append((path, fp.read()))
+
+    if not docs:
+        print('no HTML files found in %s' % ', '.join(options.paths))
+        return 1
+
+    mismatches, scanned = [], 0
+    for path, doc in docs:
+        HTMLParser.fast = False
+        expected = Recorder(doc).calls
+
+        HTMLParser.fast = True
+        recorder = Recorder(doc)
+        if recorder.calls != expected:
+            mismatches.append(path)
+
+        scanned += scan(doc) is not None
+
+    docs = [doc for path, doc in docs]
+    size = sum(len(doc) for doc in docs)
+
+    default = measure(docs, False, options.runs)
+    fast = measure(docs, True, options.runs)
+
+    print('%i documents, %.1f KiB, %i (%.0f%%) handled by the regex tokenizer'
+          % (len(docs), size / 1024, scanned, 100 * scanned / len(docs)))
+    print('%-10s %9.3fs' % ('stdlib', default))
+    print('%-10s %9.3fs %+7.1f%%' % ('regex', fast, (fast - default) / default * 100))
+
+    for path in mismatches:
+        print('mismatch: %s' % path)
+
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
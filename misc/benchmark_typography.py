@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+#
+# Copyright 2012 Martin Zimmermann <info@posativ.org>. All rights reserved.
+# License: BSD Style, 2 clauses -- see LICENSE.
+#
+# Compare the single-pass typography filter with applying each filter on its own.
+
+"""
+Applies the typography filters to HTML files (by default the compiled blog in
+``output/``) one after another and with a single
+:class:`acrylamid.filters.typography.Typesetter`, verifies that both produce
+the same output and reports the time spent::
+
+    $ acrylamid compile
+    $ python misc/benchmark_typography.py output/
+"""
+
+from __future__ import print_function, division
+
+import sys
+import os
+import io
+import timeit
+import argparse
+
+from os.path import join, dirname, abspath, isdir
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+import smartypants
+
+from acrylamid.filters import typography
+from acrylamid.filters.typography import Typesetter, FILTERS
+
+
+def educate(text):
+    """SmartyPants with attributes "2"."""
+
+    try:
+        return smartypants.smartyPants(text, "2")
+    except AttributeError:
+        return smartypants.smartypants(text, smartypants.Attr.set2)
+
+
+def chain(filters):
+
+    functions = [educate if name == 'smartypants' else getattr(typography, name)
+                 for name in FILTERS if name in filters]
+
+    def apply(text):
+        for func in functions:
+            text = func(text)
+        return text
+
+    return apply
+
+
+def documents(paths, extensions=('.html', '.htm', '.xml')):
+
+    for path in paths:
+        if not isdir(path):
+            yield path
+            continue
+
+        for root, dirs, files in os.walk(path):
+            for fname in sorted(files):
+                if fname.endswith(extensions):
+                    yield join(root, fname)
+
+
+def measure(docs, func, runs):
+    return min(timeit.repeat(lambda: [func(doc) for doc in docs], number=1, repeat=runs))
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n\n')[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=['output'],
+                        help='HTML files or directories (default: output/)')
+    parser.add_argument('-r', '--runs', type=int, default=5,
+                        help='runs per variant, the minimum is reported')
+    parser.add_argument('-a', '--all', action='store_true',
+                        help='apply all filters, not only amp, widont, smartypants, caps')
+
+    options = parser.parse_args(argv)
+    filters = FILTERS if options.all else ('amp', 'widont', 'smartypants', 'caps')
+
+    docs = []
+    for path in documents(options.paths):
+        with io.open(path, encoding='utf-8', errors='replace') as fp:
+            docs.append((path, fp.read()))
+
+    if not docs:
+        print('no HTML files found in %s' % ', '.join(options.paths))
+        return 1
+
+    default, typesetter = chain(filters), Typesetter(filters)
+
+    mismatches, tokenized = [], 0
+    for path, doc in docs:
+        if default(doc) != typesetter(doc):
+            mismatches.append(path)
+        tokenized += typesetter.tokenize(doc) is not None
+
+    docs = [doc for path, doc in docs]
+    size = sum(len(doc) for doc in docs)
+
+    before = measure(docs, default, options.runs)
+    after = measure(docs, typesetter, options.runs)
+
+    print('%i documents, %.1f KiB, %i (%.0f%%) transformed in a single pass'
+          % (len(docs), size / 1024, tokenized, 100 * tokenized / len(docs)))
+    print('%-10s %9.3fs' % ('chained', before))
+    print('%-10s %9.3fs %+7.1f%%' % ('single', after, (after - before) / before * 100))
+
+    for path in mismatches:
+        print('mismatch: %s' % path)
+
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,6 +9,7 @@ from . import (lib, readers, filters, filters_builtin, helpers,
 
 testsuite = Tests()
 testsuite.register(lib.TestHTMLParser)
+testsuite.register(lib.TestWatch)
 testsuite.register(readers.tt)
 testsuite.register(filters.TestFilterlist)
 testsuite.register(filters.TestFilterTree)
@@ -26,4 +27,6 @@ testsuite.register(entry.TestEntry)
 testsuite.register(content.SingleEntry)
 testsuite.register(content.MultipleEntries)
 testsuite.register(core.Cache)
+testsuite.register(core.LegacyCache)
+testsuite.register(core.Tracker)
 testsuite.register(search.tt)
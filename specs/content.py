@@ -9,11 +9,20 @@ from acrylamid import core, log, utils, helpers
 from acrylamid.compat import iteritems
 from acrylamid.commands import compile
 from acrylamid.defaults import conf
+from acrylamid.templates import AbstractEnvironment
+from acrylamid.templates.jinja2 import Environment
 
 # supress warnings
 log.init('acrylamid', 40)
 options = type('Options', (object, ), {
-    'ignore': False, 'force': False, 'dryrun': False, 'parser': 'compile'})
+    'ignore': False, 'force': False, 'dryrun': False, 'parser': 'compile', 'jobs': 1})
+
+
+class Engine(Environment):
+    """A template engine that can not be re-used across compilations."""
+
+    warm = AbstractEnvironment.warm
+    invalidate = AbstractEnvironment.invalidate
 
 
 def entry(**kw):
@@ -59,6 +68,56 @@ class SingleEntry(attest.TestBase):
             self.conf['views'] = {'/:year/:slug/': {'view': 'entry'}}
             yield
 
+    @attest.test
+    def entry_permalink(self):
+
+        self.conf['theme'] = ['layouts/']
+        self.conf['views'] = {'/:year/:slug/': {'view': 'entry'}, '/': {'view': 'index'}}
+
+        with open('layouts/main.html', 'w') as fp:
+            fp.write('{% for entry in env.entrylist %}{{ entry.permalink }}{% endfor %}')
+
+        with open('content/bla.txt', 'w') as fp:
+            fp.write(entry(title='Foo'))
+
+        for path in 'layouts/main.html', 'content/bla.txt':
+            os.utime(path, (0, 0))
+
+        compile(self.conf, self.env)
+        assert open(join('output', 'index.html')).read() == '/2012/foo/'
+
+        helpers.event.reset()
+        compile(self.conf, self.env)
+        assert helpers.event.count('skip') == 2
+
+        # entries read ENTRY_PERMALINK, all views depend on it
+        helpers.event.reset()
+        self.conf['entry_permalink'] = '/posts/:year/:slug/'
+
+        compile(self.conf, self.env)
+        assert helpers.event.count('skip') == 0
+        assert open(join('output', 'index.html')).read() == '/posts/2012/foo/'
+        assert open(join('output', '2012', 'foo', 'index.html')).read() == '/posts/2012/foo/'
+
+    @attest.test
+    def cold_engine(self):
+
+        self.conf['engine'] = 'specs.content.Engine'
+        self.conf['theme'] = ['layouts/']
+
+        with open('content/bla.txt', 'w') as fp:
+            fp.write(entry(title='Foo'))
+
+        warm = {}
+        compile(self.conf, self.env, None, warm)
+        assert warm == {}
+
+        with open('content/bla.txt', 'w') as fp:
+            fp.write(entry(title='Foo').replace('supercali', 'Supercali'))
+
+        compile(self.conf, self.env, set(['content/bla.txt']), warm)
+        assert 'Supercali' in open(join('output', '2012', 'foo', 'index.html')).read()
+
     # def exists_at_permalink(self):
     #     with open('content/bla.txt', 'w') as fp:
     #         fp.write(entry())
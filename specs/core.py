@@ -1,36 +1,43 @@
 # -*- coding: utf-8 -*-
 
+import os
+import time
 import attest
-from acrylamid.core import cache
+
+from binascii import hexlify
+from acrylamid.core import cache, tracker, Configuration, Environment
+from acrylamid.lib.highlight import fetch
 
 
 class Cache(attest.TestBase):
 
+    backend = 'sqlite'
+
     def __context__(self):
         with attest.tempdir() as path:
             self.path = path
-            cache.init(self.path)
+            cache.init(self.path, self.backend)
 
         yield
 
     @attest.test
     def persistence(self):
 
-        cache.init(self.path)
+        cache.init(self.path, self.backend)
         cache.set('foo', 'bar', "Hello World!")
         cache.set('foo', 'baz', "spam")
         assert cache.get('foo', 'bar') == "Hello World!"
         assert cache.get('foo', 'baz') == "spam"
 
         cache.shutdown()
-        cache.init(self.path)
+        cache.init(self.path, self.backend)
         assert cache.get('foo', 'bar') == "Hello World!"
         assert cache.get('foo', 'baz') == "spam"
 
     @attest.test
     def remove(self):
 
-        cache.init(self.path)
+        cache.init(self.path, self.backend)
         cache.set('foo', 'bar', 'baz')
         cache.remove('foo')
         cache.remove('invalid')
@@ -41,10 +48,118 @@ class Cache(attest.TestBase):
     @attest.test
     def clear(self):
 
-        cache.init(self.path)
+        cache.init(self.path, self.backend)
         cache.set('foo', 'bar', 'baz')
         cache.set('spam', 'bar', 'baz')
 
         cache.clear()
         assert cache.get('foo', 'bar') == None
         assert cache.get('spam', 'bar') == None
+
+    @attest.test
+    def mtime(self):
+
+        cache.init(self.path, self.backend)
+        assert cache.getmtime('foo') == 0.0
+
+        cache.set('foo', 'bar', 'baz')
+        assert cache.getmtime('foo') > 0.0
+
+        cache.remove('foo')
+        assert cache.getmtime('foo') == 0.0
+
+    @attest.test
+    def evict(self):
+
+        cache.init(self.path, self.backend)
+        for path in 'aa', 'bb', 'cc':
+            cache.set(path, 'key', hexlify(os.urandom(1024)).decode('ascii'))
+
+        cache.backend.touch(['bb', 'cc'], time.time() + 60)
+        size = sum(obj[1] for obj in cache.objects())
+
+        cache.evict(size - 1)
+        assert sorted(obj[0] for obj in cache.objects()) == ['bb', 'cc']
+        assert cache.get('aa', 'key') == None
+
+    @attest.test
+    def highlight(self):
+
+        cache.init(self.path, self.backend)
+        calls = []
+
+        for i in range(2):
+            assert fetch(('python', 'print 1'), lambda: calls.append(i) or '<pre/>') == '<pre/>'
+
+        assert calls == [0]
+        assert [obj[0][:10] for obj in cache.objects()] == ['highlight-']
+
+
+class LegacyCache(Cache):
+
+    backend = 'directory'
+
+
+class Tracker(attest.TestBase):
+
+    def __context__(self):
+        with attest.tempdir() as path:
+            cache.init(path)
+            cache.memoize.clear()
+            self.conf = Configuration({'sitename': 'foo', 'lang': 'en'})
+            self.env = Environment({'path': '', 'globals': Environment()})
+            yield
+
+    def compile(self, view, *keys):
+        tracker.init(self.conf, self.env)
+        modified = tracker.modified(view)
+        with tracker.record(view):
+            for key in keys:
+                self.conf.get(key)
+            copy = Environment()
+            copy.update(self.env)
+            copy.path
+        tracker.save()
+        return modified
+
+    @attest.test
+    def keys(self):
+
+        view = type('View', (object, ), {'name': 'index', 'path': '/', 'filters': [],
+                                          '_getkwargs': lambda self: {}})()
+
+        assert self.compile(view, 'sitename')
+        assert not self.compile(view, 'sitename')
+
+        self.conf['lang'] = 'de'
+        self.conf['unused'] = True
+        assert not self.compile(view, 'sitename')
+
+        self.conf['sitename'] = 'bar'
+        assert self.compile(view)
+
+        # recorded keys are kept even if not read in between
+        self.conf['sitename'] = 'baz'
+        assert self.compile(view)
+
+        self.env['path'] = '/blog'
+        assert self.compile(view)
+
+        view.filters = ['h1']
+        assert self.compile(view)
+        assert not self.compile(view)
+
+    @attest.test
+    def filters(self):
+
+        view = type('View', (object, ), {'name': 'tag', 'path': '/', 'filters': [],
+                                          '_getkwargs': lambda self: {}})()
+
+        assert self.compile(view)
+        with tracker.record('filters'):
+            self.conf['lang']
+        tracker.save()
+
+        self.conf['lang'] = 'fr'
+        assert self.compile(view)
+        assert not self.compile(view)
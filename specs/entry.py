@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import os
+import time
 import tempfile
 import attest
 
@@ -9,6 +11,7 @@ from acrylamid import log
 from acrylamid.errors import AcrylamidException
 from acrylamid.compat import iteritems
 
+from acrylamid.core import cache
 from acrylamid.readers import Entry
 from acrylamid.defaults import conf
 
@@ -117,3 +120,41 @@ class TestEntry(attest.TestBase):
         assert entry.year == datetime.now().year
         assert entry.imonth == datetime.now().month
         assert entry.iday == datetime.now().day
+
+    @attest.test
+    def digest(self):
+
+        create(self.path, title='Bla', date='13.02.2011, 15:36')
+
+        with attest.tempdir() as path:
+            cache.init(path)
+            dconf = dict(conf, cache_validation='digest')
+
+            entry = Entry(self.path, dconf)
+            assert entry.modified
+            entry.purge()
+
+            # a fresh checkout only changes the modification time
+            os.utime(self.path, (time.time() + 60, time.time() + 60))
+            assert not Entry(self.path, dconf).modified
+
+            with open(self.path, 'a') as fp:
+                fp.write('Hello World!\n')
+            assert Entry(self.path, dconf).modified
+
+    @attest.test
+    def reset(self):
+
+        create(self.path, title='Bla', date='13.02.2011, 15:36', filter='markdown')
+
+        with attest.tempdir() as path:
+            cache.init(path)
+
+            entry = Entry(self.path, conf)
+            entry.filters.add(['markdown'], context=None)
+            assert entry.modified
+
+            entry.reset()
+            assert 'modified' not in entry.__dict__
+            assert entry.filters == ['markdown']
+            assert entry.filters.views == {None: entry.filters}
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import json
+
 from acrylamid import log, utils, core
 from acrylamid.filters import initialize, get_filters
 
@@ -9,12 +11,12 @@ tt = attest.Tests()
 
 log.init('foo', 35)
 
-conf = core.Configuration({'lang': 'en', 'theme': ''})
+conf = core.Configuration({'lang': 'en', 'theme': '', 'filters_dir': []})
 env = utils.Struct({'path': '', 'engine': None, 'options': type('X', (), {'ignore': False})})
 initialize([], conf, env)
 
 # now we have filters in path
-from acrylamid.filters.hyphenation import build
+from acrylamid.filters.hyphenation import build, Hyphenator
 
 
 class Entry(object):
@@ -29,30 +31,40 @@ class Hyphenation(attest.TestBase):
 
     @attest.test
     def hyphenate(self):
-        pass
-        # hyph = get_filters()['Hyphenate'](conf, env, 'Hyphenate')
 
-        # hyph.transform('Airplane', Entry('en')) == 'Airplane'
-        # hyph.transform('supercalifragilisticexpialidocious', Entry('en')) == \
-        #                  '&shy;'.join(['su', 'per', 'cal', 'ifrag', 'ilis', 'tic', 'ex',
-        #                                'pi', 'ali', 'do', 'cious'])
+        hyph = get_filters()['Hyphenate'](conf, env, 'Hyphenate')
+
+        assert hyph.transform('Airplane', Entry('en')) == 'Airplane'
+        assert hyph.transform('supercalifragilisticexpialidocious', Entry('en')) == \
+                         '&shy;'.join(['su', 'per', 'cal', 'ifrag', 'ilis', 'tic', 'ex',
+                                       'pi', 'ali', 'do', 'cious'])
 
-        # hyph = get_filters()['Hyphenate'](conf, env, 'Hyphenate')
+        hyph = get_filters()['Hyphenate'](conf, env, 'Hyphenate')
 
-        # assert hyph.transform('Flugzeug', Entry('de'), '8') == 'Flugzeug'
-        # assert hyph.transform('Flugzeug', Entry('de'), '7') == 'Flug&shy;zeug'
+        assert hyph.transform('Flugzeug', Entry('de'), '8') == 'Flugzeug'
+        assert hyph.transform('Flugzeug', Entry('de'), '7') == 'Flug&shy;zeug'
 
-        # # test unsupported
-        # assert hyph.transform('Flugzeug', Entry('foo'), '8') == 'Flugzeug'
+        # test unsupported
+        assert hyph.transform('Flugzeug', Entry('foo'), '8') == 'Flugzeug'
 
     @attest.test
     def build_pattern(self):
-        pass
-        # # short term
-        # build('en')
 
-        # hyphenate = build('en_US')
-        # assert hyphenate('Airplane') == ['Air', 'plane']
+        # short term
+        build('en')
+
+        hyphenate = build('en_US')
+        assert hyphenate('Airplane') == ['Air', 'plane']
+
+        # memoized per language and word
+        assert build('en_US') is hyphenate
+        assert hyphenate('Airplane') is hyphenate('Airplane')
+
+        # the pattern tree survives a JSON round-trip
+        tree = json.loads(json.dumps(hyphenate.__self__.tree))
+        hyphenator = Hyphenator('', '', tree=tree)
+        assert hyphenator.hyphenate_word('supercalifragilisticexpialidocious') == \
+            hyphenate('supercalifragilisticexpialidocious')
 
 
 @tt.test
@@ -76,6 +88,39 @@ def mako():
     assert mako.transform("${ 'which which' | system }", e) == '/usr/bin/which'
 
 
+@tt.test
+def markdown():
+
+    md = get_filters()['Markdown'](conf, env, 'Markdown', 'abbr', 'footnotes')
+
+    text = 'A post[^1].\n\n[^1]: note'
+    first = md.transform(text, Entry())
+    assert md.transform(text, Entry()) == first
+
+    # abbreviations must not leak into other entries
+    assert 'abbr' in md.transform('HTML\n\n*[HTML]: Hyper Text', Entry())
+    assert 'abbr' not in md.transform('HTML', Entry())
+
+
+@tt.test
+def pandoc():
+
+    from acrylamid.filters.pandoc import batches
+
+    texts = ['# Intro\n\nfoo', 'bar', 'Intro!\n======\n\nbaz',
+             'see[^1]\n\n[^1]: note', '[a]\n\n[a]: /a/', 'qux']
+
+    # shared headers start a new batch, document-wide syntax is left out
+    assert list(batches(texts, 32)) == [texts[:2], [texts[2], texts[5]]]
+    assert list(batches(texts, 2)) == [texts[:2], [texts[2], texts[5]]]
+    assert list(batches(['foo', 'bar', 'baz'], 2)) == [['foo', 'bar']]
+
+    # references resolve to headers of other texts (implicit header references)
+    texts = ['see [Intro]', '# Intro\n\nfoo', 'see [the intro][intro]', 'see [Intro](/)']
+    assert list(batches(texts, 32)) == [texts[2:]]
+    assert list(batches(texts[1:] + texts[:1], 32)) == [texts[2:] + texts[:1]]
+
+
 @tt.test
 def acronyms():
 
@@ -87,12 +132,21 @@ def acronyms():
         ('IMDB', abbr('IMDB', 'Internet Movie Database')),
         ('IMDb', abbr('IMDb', 'Internet Movie Database')),
         ('PHP5', abbr('PHP5', 'Programmers Hate PHP ;-)')),
+        ('OSI', abbr('OSI', 'Open Source Initiative; Open Systems Interconnection')),
         ('TEST', 'TEST')
     ]
 
     for test, result in examples:
         assert acronyms.transform(test, None) == result
 
+    # only the given acronyms
+    assert acronyms.transform('CGI and OS', None, 'OS') == 'CGI and ' + \
+        abbr('OS', 'Operating System; Open Source')
+
+    from acrylamid.filters.acronyms import factor
+    assert factor(['OS', 'OSI', 'OSS']) == 'OS[IS]?'
+    assert factor(['a', 'ab', 'abc', 'b']) == '(?:a(?:bc?)?|b)'
+
 
 @tt.test
 def headoffset():
@@ -161,6 +215,37 @@ def intro():
     for text, result in examples:
         assert intro.transform(text, Entry(), '1') == result
 
+    # a break comment ends the introduction, too
+    assert intro.transform('<p>First</p><div><p>Se<!-- more -->cond</p></div>', Entry(), '3') == \
+        '<p>First</p><div><p>Se</p></div><span>&#8230;<a href="/foo/" class="continue">continue</a>.</span>'
+
+
+@tt.test
+def typography():
+
+    from acrylamid.filters.typography import Typesetter, FILTERS, amp, widont, \
+        caps, initial_quotes, number_suffix
+
+    typo = get_filters()['typography'](conf, env, 'typography')
+
+    assert typo.transform('<p>"Tom & Jerry" -- a TV show by MGM</p>', Entry()) == (
+        '<p>&#8220;Tom <span class="amp">&amp;</span> Jerry&#8221; &#8211; a '
+        '<span class="caps">TV</span> show by&nbsp;<span class="caps">MGM</span></p>')
+    assert typo.transform('<code>"NASA" -- 1st</code>', Entry(), 'all') == \
+        '<code>"NASA" -- 1<span class=\'ord\'>st</span></code>'
+
+    # same output as each filter on its own, even with stray brackets
+    typesetter = Typesetter(FILTERS)
+    examples = [
+        '<p>"Tom & Jerry" -- the 2nd TV show</p>',
+        '<ul><li>\'Quoted\' <em>D.O.T.</em> words</li><li>A & B</li></ul>',
+        '<h1><a href="#">In a link inside a heading</a> </h1><code>"CAPS"</code>',
+        '<p>1 < 2 & 3 > 2</p>', '<img alt="A & B" data-x="1 & 2" /> & so on']
+
+    for text in examples:
+        rv = typesetter.smartypants(widont(amp(text)))
+        assert typesetter(text) == number_suffix(initial_quotes(caps(rv)))
+
 
 @tt.test
 def strip():
@@ -221,3 +306,22 @@ def liquid():
 
     for text, result in examples:
         assert liquid.transform(text, Entry()) == result
+
+    # oEmbed responses are cached, expired responses are used offline
+    from acrylamid.filters.liquid import embeds, oembed
+
+    url = oembed('https://twitter.com/x/status/1 align=center')
+    assert url.endswith('?url=https%3A%2F%2Ftwitter.com%2Fx%2Fstatus%2F1&align=center')
+
+    embeds.storage()[url] = (0, '<p>Hi</p>')
+    tag = '{% tweet https://twitter.com/x/status/1 align=center %}'
+    assert liquid.transform(tag, Entry()) == "<div class='embed tweet'><p>Hi</p></div>"
+
+    embeds.ttl, embeds.offline = 60, True
+    assert not embeds.valid(url)
+    assert liquid.transform(tag, Entry()) == "<div class='embed tweet'><p>Hi</p></div>"
+    assert liquid.transform('{% tweet 2 %}', Entry()) == \
+        "<div class='embed tweet'>Tweet could not be fetched</div>"
+
+    embeds.ttl, embeds.offline = None, False
+    del embeds.storage()[url]
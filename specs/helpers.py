@@ -3,6 +3,7 @@
 import attest
 
 from acrylamid import helpers, refs
+from acrylamid.core import cache
 from acrylamid import AcrylamidException
 
 
@@ -86,6 +87,31 @@ class Helpers(attest.TestBase):
         assert list(helpers.paginate([X('1'), X('2'), X('3')], 3, orphans=1)) == \
             [((None, 1, None), [X('1'), X('2'), X('3')], True)]
 
+    @attest.test
+    def rpaginate(self):
+
+        X = type('X', (str, ), {'modified': False}); refs.load()
+        cache.memoize.clear()
+
+        res = [X(_) for _ in range(8)]
+        assert [(x, entries) for x, entries, _ in helpers.paginate(res, 3, reverse=True)] == \
+            [((None, 3, 2), res[:2]), ((3, 2, 1), res[2:5]), ((2, 1, None), res[5:])]
+        assert [(x, entries) for x, entries, _ in helpers.paginate(res, 3, orphans=2, reverse=True)] == \
+            [((None, 2, 1), res[:5]), ((2, 1, None), res[5:])]
+
+        # a new entry modifies only the newest page
+        assert [m for _, _, m in helpers.paginate(res, 3, 'x', reverse=True)] == [True] * 3
+        assert [m for _, _, m in helpers.paginate(res, 3, 'x', reverse=True)] == [False] * 3
+
+        res.insert(0, X('new'))
+        assert [m for _, _, m in helpers.paginate(res, 3, 'x', reverse=True)] == \
+            [True, False, False]
+
+        # ... and the page before if it overflows
+        res.insert(0, X('newer'))
+        assert [m for _, _, m in helpers.paginate(res, 3, 'x', reverse=True)] == \
+            [True, True, False, False]
+
     @attest.test
     def safe(self):
 
@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import os
+import attest
+
 from attest import test, TestBase
 
-from acrylamid.lib.html import HTMLParser
+from acrylamid.lib.html import HTMLParser, Events, StopParsing, scan, tokenize
+from acrylamid.lib.watch import Watcher, Inotify, Polling
 
 f = lambda x: ''.join(HTMLParser(x).result)
 
@@ -53,3 +57,150 @@ class TestHTMLParser(TestBase):
     def charrefs(self):
 
         assert f('<span>&#1234;</span>') == '<span>&#1234;</span>'
+
+    @test
+    def stream(self):
+
+        class Upper(HTMLParser):
+            def handle_data(self, data):
+                self.result.append(data.upper())
+
+        class Wrap(HTMLParser):
+            def handle_starttag(self, tag, attrs):
+                if tag == 'p':
+                    self.result.append('<div class="p">')
+                super(Wrap, self).handle_starttag(tag, attrs)
+
+            def handle_endtag(self, tag):
+                super(Wrap, self).handle_endtag(tag)
+                if tag == 'p':
+                    self.result.append('</div>')
+
+        examples = [
+            '<p>Foo <em>bar</em><br /> baz</p><!-- more -->',
+            '<p>x &lt;b&gt; y</p><script>if (a<b) {}</script>',
+            '<pre><code>&amp; foo</code></pre><p>&shy;</p>',
+        ]
+
+        for ex in examples:
+            res = ex
+            for stage in Wrap, Upper, Wrap:
+                res = stage(res).output
+
+            events = Events.fromstring(ex)
+            for stage in Wrap, Upper, Wrap:
+                events = stage(events).output
+
+            assert isinstance(events, Events)
+            assert events.serialize() == res
+
+        assert HTMLParser(Events.fromstring('<p>Foo</p>')).output.serialize() == '<p>Foo</p>'
+
+    @test
+    def scan(self):
+
+        class Recorder(HTMLParser):
+            def __init__(self, html):
+                self.calls = []
+                super(Recorder, self).__init__(html)
+
+            def handle_starttag(self, tag, attrs):
+                self.calls.append(('starttag', (tag, attrs)))
+
+            def handle_startendtag(self, tag, attrs):
+                self.calls.append(('startendtag', (tag, attrs)))
+
+            def handle_endtag(self, tag):
+                self.calls.append(('endtag', (tag, )))
+
+            def handle_data(self, data):
+                self.calls.append(('data', (data, )))
+
+            def handle_comment(self, comment):
+                self.calls.append(('comment', (comment, )))
+
+        if not HTMLParser.fast:
+            return
+
+        examples = [
+            '<p id="foo" class=bar>Foo &amp; <EM>bar</EM></P>',
+            '<a href="/?a=1&amp;b=2" title>x</a><br/><img src=\'a.png\' alt="" />',
+            '<script>if (a<b) {}</script ><!-- more --><style>p > a {}</style>',
+        ]
+
+        for ex in examples:
+            try:
+                HTMLParser.fast = False
+                expected = Recorder(ex).calls
+            finally:
+                HTMLParser.fast = True
+
+            assert scan(ex) == expected
+            assert Recorder(ex).calls == expected
+
+        for ex in ['a < b', '<a b="1"c="2">', '<script>unclosed', '<![CDATA[x]]>', 'AT&T']:
+            assert scan(ex) is None
+
+            # the stdlib parser continues where the tokenizer gives up
+            ex = '<p>Foo</p>' + ex
+            try:
+                HTMLParser.fast = False
+                expected = Recorder(ex).calls
+            finally:
+                HTMLParser.fast = True
+
+            assert Recorder(ex).calls == expected
+
+    @test
+    def stop(self):
+
+        class First(HTMLParser):
+            def handle_endtag(self, tag):
+                super(First, self).handle_endtag(tag)
+                raise StopParsing
+
+        for html in '<p>Foo</p><p>Bar</p>', '<p>Foo</p><p>Bar &</p>':
+            assert First(html).output == '<p>Foo</p>'
+            assert First(Events.fromstring(html)).output.serialize() == '<p>Foo</p>'
+            assert First(tokenize(html)).output.serialize() == '<p>Foo</p>'
+
+
+class TestWatch(TestBase):
+
+    def __context__(self):
+        with attest.tempdir() as path:
+            self.path = path
+            os.mkdir(os.path.join(path, 'ignored'))
+            yield
+
+    def changes(self, cls):
+
+        watcher = cls([(self.path, ['.*', '/ignored/'])], delay=0.05)
+        join = lambda *p: os.path.join(self.path, *p)
+
+        assert watcher.wait(timeout=0.1) == set()
+
+        for path in join('foo.txt'), join('.bar.txt'), join('ignored', 'baz.txt'):
+            with open(path, 'w') as fp:
+                fp.write('Hello World!')
+
+        assert watcher.wait(timeout=3) == set([join('foo.txt')])
+        watcher.close()
+
+    @test
+    def abstract(self):
+
+        class Foo(Watcher):
+            pass
+
+        with attest.raises(TypeError):
+            Foo([(self.path, [])])
+
+    @test
+    def polling(self):
+        self.changes(lambda *args, **kw: Polling(*args, interval=0.01, **kw))
+
+    @test
+    def inotify(self):
+        if Inotify.available():
+            self.changes(Inotify)
@@ -3,11 +3,13 @@
 from __future__ import unicode_literals
 
 import io
+import os
 import attest
 
 tt = attest.Tests()
 from acrylamid.readers import reststyle, markdownstyle, distinguish, ignored
-from acrylamid.readers import pandocstyle
+from acrylamid.readers import pandocstyle, headers, fieldlist, docinfo
+from acrylamid.core import cache
 
 
 @tt.test
@@ -38,6 +40,26 @@ def rest():
     assert meta['draft'] is True
 
 
+@tt.test
+def fields():
+
+    examples = [
+        [':date: 2001-08-16\n', ':tags: [foo, bar]\n', ':Summary: a  long\n', '   text\n'],
+        [':parameter i: http://example.org/foo_bar\n', ':version: 1\n'],
+    ]
+
+    for lines in examples:
+        assert fieldlist(lines) == docinfo(''.join(lines))
+
+    # everything else is left to docutils
+    for value in ['*foo*', '``foo``', 'foo_', '- foo', '1. foo', 'foo::', '|sub|',
+                  '$Date: 2001-08-16 $', 'foo\n      bar\n    baz', '\n---']:
+        assert fieldlist([':tags: %s\n' % value]) is None
+
+    assert fieldlist([':authors: foo, bar']) is None
+    assert fieldlist(['foo']) is None
+
+
 @tt.test
 def mkdown():
 
@@ -139,3 +161,28 @@ def ignore():
     assert ignored('/', '.gitignore', ['.git*'], '/')
 
     assert ignored('/', '.DS_Store', ['.DS_Store'], '/')
+
+
+@tt.test
+def index():
+
+    with attest.tempdir() as path:
+        cache.init(path)
+        src = os.path.join(path, 'entry.txt')
+
+        with io.open(src, 'w') as fp:
+            fp.write('---\ntitle: Foo\n---\n\nHello World.\n')
+
+        assert headers([src])[src] == (3, {'title': 'Foo'})
+        assert os.path.isfile(os.path.join(path, 'headers'))
+
+        # unchanged files are served from the index without parsing
+        st = os.stat(src)
+        with io.open(src, 'w') as fp:
+            fp.write('---\ntitle: Bar\n---\n\nHello World.\n')
+        os.utime(src, (st.st_atime, st.st_mtime))
+
+        assert headers([src])[src][1]['title'] == 'Foo'
+
+        os.utime(src, (st.st_atime, st.st_mtime + 1))
+        assert headers([src])[src][1]['title'] == 'Bar'
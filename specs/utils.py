@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from acrylamid.utils import Metadata, neighborhood
+from acrylamid.utils import Metadata, neighborhood, LRU
 
 import attest
 tt = attest.Tests()
@@ -65,3 +65,51 @@ def neighbors():
 
     assert list(neighborhood([1, 2, 3])) == \
         [(None, 1, 2), (1, 2, 3), (2, 3, None)]
+
+
+@tt.test
+def lru():
+
+    lru = LRU(2)
+    lru.set('a', 1)
+    lru.set('b', 2)
+
+    assert lru.get('a') == 1
+    lru.set('c', 3)
+
+    assert 'b' not in lru
+    assert lru.get('b') is None
+    assert lru.get('c') == 3
+    assert (lru.hits, lru.misses) == (2, 1)
+
+    lru.clear()
+    assert len(lru) == 0
+    assert (lru.hits, lru.misses) == (0, 0)
+
+
+@tt.test
+def profile():
+
+    from acrylamid import profiler
+
+    profiler.enabled = False
+    with profiler.timed('noop'):
+        pass
+    assert list(profiler.iterate('noop', [1, 2])) == [1, 2]
+    assert 'noop' not in profiler.collect()
+
+    profiler.enable()
+    try:
+        with profiler.timed('block'):
+            pass
+        assert list(profiler.iterate('generate', [1, 2, 3])) == [1, 2, 3]
+
+        stats = profiler.collect()
+        assert stats['block'][0] == 1
+        assert stats['generate'][0] == 1
+
+        profiler.merge(stats)
+        profiler.merge(stats)
+        assert profiler.collect()['block'][0] == 2
+    finally:
+        profiler.enabled = False